@@ -1,3 +1,4 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import threading
@@ -6,8 +7,10 @@ import os
 from datetime import datetime  # Added for report timestamp
 
 import report
+import jobs
 import enroll      # for enrolling student 
-import recognize   # For Recognizing the face
+import engine      # For Recognizing the face
+from gallery import PRECISIONS
 from utils import load_student_data  # For load the data from student folder
 
 SUBJECT = "Data Visualization"
@@ -34,7 +37,7 @@ def view_attendance_file():
 
 # Dashboard Design
 class Dashboard(tk.Tk):
-    def __init__(self):
+    def __init__(self, precision='float64', encoder_workers=0, matcher_address=None):
         super().__init__()
         self.title("Smart Attendance System Dashboard")
         self.geometry("900x600")
@@ -56,6 +59,20 @@ class Dashboard(tk.Tk):
         # Create sidebar buttons
         self.create_sidebar_buttons()
         
+        # Background jobs (reports, exports, bulk operations) run off the Tk thread;
+        # their progress is polled from here.
+        self.jobs = jobs.JobRunner(max_workers=3)
+        self.job_tree = None
+        self.after(100, self.poll_jobs)
+        
+        # One recognition engine for the whole session keeps the gallery, models
+        # and camera warm between lectures; it loads lazily on the first start.
+        self.recognition_engine = engine.RecognitionEngine(precision=precision,
+                                                           encoder_workers=encoder_workers,
+                                                           matcher_address=matcher_address)
+        # Closing the window must free the camera and worker processes too.
+        self.protocol("WM_DELETE_WINDOW", self.exit_app)
+        
         # Start with the welcome (home) page.
         self.current_page = None
         self.show_welcome_page()
@@ -85,7 +102,26 @@ class Dashboard(tk.Tk):
         tk.Button(self.sidebar_frame, text="View Students",
                 command=self.show_view_students_page, **btn_config).pack(pady=10)
         tk.Button(self.sidebar_frame, text="Exit",
-                command=self.quit, **btn_config).pack(pady=10)
+                command=self.exit_app, **btn_config).pack(pady=10)
+
+    def exit_app(self):
+        self.recognition_engine.shutdown()
+        self.jobs.shutdown()
+        self.quit()
+
+    def poll_jobs(self):
+        """Apply job progress to the jobs table and run completion callbacks on the Tk thread."""
+        for job in self.jobs.poll_events():
+            if self.job_tree is not None and self.job_tree.winfo_exists():
+                values = (job.id, job.name, job.status, f"{job.progress:.0%}", job.message)
+                if self.job_tree.exists(str(job.id)):
+                    self.job_tree.item(str(job.id), values=values)
+                else:
+                    self.job_tree.insert("", 0, iid=str(job.id), values=values)
+            if job.finished and job.on_done is not None:
+                on_done, job.on_done = job.on_done, None
+                on_done(job)
+        self.after(100, self.poll_jobs)
 
     #authentication part
     def authenticate_and_show_add_student(self):
@@ -178,11 +214,15 @@ class Dashboard(tk.Tk):
                 page.after(0, lambda: messagebox.showwarning("Input Error",
                                                               "Please enter name, enrollment ID, and class."))
                 return
+            # Enrollment needs the camera; the engine reopens it on the next start.
+            self.recognition_engine.release_camera()
             try:
                 enroll.enroll_student(student_name, enrollment_id, student_class)
             except Exception as e:
                 page.after(0, lambda: messagebox.showerror("Error", f"Enrollment failed: {e}"))
                 return
+            if self.recognition_engine.ready:
+                self.recognition_engine.reload_gallery()
             page.after(0, on_enrollment_complete)
         
         def on_enrollment_complete():
@@ -222,13 +262,58 @@ class Dashboard(tk.Tk):
         subject_combo.current(0)  # Default subject
         subject_combo.pack(pady=(0,20))
         
+        recognition_engine = self.recognition_engine
+        if recognition_engine.subject in subject_list:
+            subject_combo.set(recognition_engine.subject)
+        
         def start_recognition():
             selected_subject = subject_combo.get()
-            threading.Thread(target=recognize.recognize_students, args=(0, selected_subject), daemon=True).start()
+            if not recognition_engine.ready:
+                # The first start loads the gallery; keep that off the Tk thread.
+                threading.Thread(target=recognition_engine.start, args=(selected_subject,), daemon=True).start()
+            else:
+                recognition_engine.start(selected_subject)
         
-        tk.Button(page, text="Start Recognition", font=("Helvetica", 12, "bold"),
+        def toggle_pause():
+            if recognition_engine.state == engine.PAUSED:
+                recognition_engine.resume()
+            else:
+                recognition_engine.pause()
+        
+        def on_subject_selected(event):
+            # Switch subject without restarting the camera.
+            if recognition_engine.state != engine.STOPPED:
+                recognition_engine.set_subject(subject_combo.get())
+        
+        subject_combo.bind("<<ComboboxSelected>>", on_subject_selected)
+        
+        button_frame = tk.Frame(page, bg="#ECF0F1")
+        button_frame.pack(pady=20)
+        tk.Button(button_frame, text="Start Recognition", font=("Helvetica", 12, "bold"),
                   command=start_recognition, bg="#1ABC9C", fg="white", padx=20, pady=10)\
-                  .pack(pady=20)
+                  .grid(row=0, column=0, padx=5)
+        pause_button = tk.Button(button_frame, text="Pause", font=("Helvetica", 12, "bold"),
+                                 command=toggle_pause, bg="#F39C12", fg="white", padx=20, pady=10)
+        pause_button.grid(row=0, column=1, padx=5)
+        tk.Button(button_frame, text="Stop", font=("Helvetica", 12, "bold"),
+                  command=recognition_engine.stop, bg="#E74C3C", fg="white", padx=20, pady=10)\
+                  .grid(row=0, column=2, padx=5)
+        
+        status_label = tk.Label(page, text="", font=("Helvetica", 12, "italic"),
+                                bg="#ECF0F1", fg="#34495E")
+        status_label.pack(pady=10)
+        
+        def refresh_status():
+            if not status_label.winfo_exists():
+                return
+            status = recognition_engine.state
+            if status != engine.STOPPED:
+                status += f" - {recognition_engine.subject}"
+            status_label.config(text=f"Status: {status}")
+            pause_button.config(text="Resume" if recognition_engine.state == engine.PAUSED else "Pause")
+            page.after(200, refresh_status)
+        
+        refresh_status()
         
         self.current_page = page
 
@@ -314,6 +399,8 @@ class Dashboard(tk.Tk):
             if os.path.exists(file_path):
                 try:
                     os.remove(file_path)
+                    if self.recognition_engine.ready:
+                        threading.Thread(target=self.recognition_engine.reload_gallery, daemon=True).start()
                     messagebox.showinfo("Deleted", f"Student {name} deleted successfully.")
                     tree.delete(selected_item)
                 except Exception as e:
@@ -351,28 +438,120 @@ class Dashboard(tk.Tk):
         date_entry = tk.Entry(page, font=("Helvetica", 12), width=20)
         date_entry.pack(pady=(0,20))
         
+        def run_report_job(job, subject, month_year):
+            report_df = report.generate_monthly_report(subject, month_year, progress=job.report)
+            if report_df is None:
+                return None
+            job.report(1.0, "Saving report")
+            return report.save_report(report_df, subject, month_year)
+        
+        def on_report_done(job):
+            if job.status == jobs.FAILED:
+                messagebox.showerror("Error", f"{job.name} failed:\n{job.error}")
+            elif job.status == jobs.DONE:
+                if job.result is None:
+                    messagebox.showinfo("No Data", f"{job.name}: no attendance data found.")
+                else:
+                    messagebox.showinfo("Report Generated", f"Monthly report saved at:\n{job.result}")
+        
         def generate_report_action():
             selected_subject = subject_combo.get()
             month_year = date_entry.get().strip()
             if not month_year:
                 messagebox.showwarning("Input Error", "Please enter a valid month in YYYY-MM format.")
                 return
-            
-            report_df = report.generate_monthly_report(selected_subject, month_year)
-            if report_df is None:
-                messagebox.showinfo("No Data", "No attendance data found for this month and subject.")
+            self.jobs.submit(f"Report {selected_subject} {month_year}", run_report_job,
+                             selected_subject, month_year, on_done=on_report_done)
+        
+        def run_all_subjects_job(job, month_year):
+            saved = []
+            for index, subject in enumerate(subject_list):
+                report_df = report.generate_monthly_report(
+                    subject, month_year,
+                    progress=lambda fraction, message, index=index: job.report(
+                        (index + fraction) / len(subject_list), f"{subject}: {message}"))
+                if report_df is not None:
+                    saved.append(report.save_report(report_df, subject, month_year))
+            return saved
+        
+        def on_all_subjects_done(job):
+            if job.status == jobs.FAILED:
+                messagebox.showerror("Error", f"{job.name} failed:\n{job.error}")
+            elif job.status == jobs.DONE:
+                if not job.result:
+                    messagebox.showinfo("No Data", "No attendance data found for this month.")
+                else:
+                    messagebox.showinfo("Reports Generated", "Monthly reports saved at:\n" + "\n".join(job.result))
+        
+        def generate_all_action():
+            month_year = date_entry.get().strip()
+            if not month_year:
+                messagebox.showwarning("Input Error", "Please enter a valid month in YYYY-MM format.")
                 return
-            
-            # Save the report and notify the user
-            report_file = report.save_report(report_df, selected_subject, month_year)
-            messagebox.showinfo("Report Generated", f"Monthly report saved at:\n{report_file}")
+            self.jobs.submit(f"All subjects {month_year}", run_all_subjects_job, month_year,
+                             on_done=on_all_subjects_done)
+        
+        def on_export_done(job):
+            if job.status == jobs.FAILED:
+                messagebox.showerror("Error", f"{job.name} failed:\n{job.error}")
+            elif job.status == jobs.DONE:
+                if job.result is None:
+                    messagebox.showinfo("No Data", f"{job.name}: no attendance data found.")
+                else:
+                    messagebox.showinfo("Export Complete", f"Attendance exported to:\n{job.result}")
+        
+        def export_action():
+            selected_subject = subject_combo.get()
+            self.jobs.submit(f"Export {selected_subject}",
+                             lambda job, subject: report.export_attendance(subject, progress=job.report),
+                             selected_subject, on_done=on_export_done)
         
-        tk.Button(page, text="Generate Report", font=("Helvetica", 12, "bold"),
+        button_frame = tk.Frame(page, bg="#ECF0F1")
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Generate Report", font=("Helvetica", 12, "bold"),
                   command=generate_report_action, bg="#1ABC9C", fg="white", padx=20, pady=10)\
+                  .grid(row=0, column=0, padx=5)
+        tk.Button(button_frame, text="All Subjects", font=("Helvetica", 12, "bold"),
+                  command=generate_all_action, bg="#1ABC9C", fg="white", padx=20, pady=10)\
+                  .grid(row=0, column=1, padx=5)
+        tk.Button(button_frame, text="Export Attendance", font=("Helvetica", 12, "bold"),
+                  command=export_action, bg="#1ABC9C", fg="white", padx=20, pady=10)\
+                  .grid(row=0, column=2, padx=5)
+        
+        # Jobs table: queued, running and finished background jobs.
+        columns = ("ID", "Job", "Status", "Progress", "Message")
+        job_tree = ttk.Treeview(page, columns=columns, show="headings", height=6)
+        for col in columns:
+            job_tree.heading(col, text=col)
+            job_tree.column(col, width=60 if col in ("ID", "Progress") else 150)
+        job_tree.pack(expand=True, fill="both", pady=(10, 0))
+        for job in sorted(self.jobs.jobs.values(), key=lambda job: job.id):
+            job_tree.insert("", 0, iid=str(job.id),
+                            values=(job.id, job.name, job.status, f"{job.progress:.0%}", job.message))
+        self.job_tree = job_tree
+        
+        def cancel_selected_job():
+            selected_item = job_tree.selection()
+            if not selected_item:
+                messagebox.showwarning("No Selection", "Please select a job to cancel.")
+                return
+            for item in selected_item:
+                self.jobs.cancel(int(item))
+        
+        tk.Button(page, text="Cancel Selected Job", font=("Helvetica", 12, "bold"),
+                  command=cancel_selected_job, bg="#E74C3C", fg="white", padx=20, pady=10)\
                   .pack(pady=10)
         
         self.current_page = page
 
 if __name__ == '__main__':
-    app = Dashboard()
+    parser = argparse.ArgumentParser(description="Smart Attendance System dashboard.")
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64',
+                        help="Storage precision of the local gallery.")
+    parser.add_argument('--encoder-workers', type=int, default=0,
+                        help="Encoder worker processes for crowded frames (0 encodes in the recognizer thread).")
+    parser.add_argument('--matcher', default=None,
+                        help="Address of a running matcher_service to match against instead of a local gallery.")
+    args = parser.parse_args()
+    app = Dashboard(args.precision, args.encoder_workers, args.matcher)
     app.mainloop()
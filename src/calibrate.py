@@ -0,0 +1,264 @@
+import argparse
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from gallery import ENCODING_DIM, DEFAULT_TOLERANCE, DEFAULT_THRESHOLDS_PATH, synthetic_student_data
+from utils import load_student_data
+
+# Calibrated thresholds are kept inside this range so that a student with
+# very tight or very few samples cannot end up unmatchable or matching everyone.
+MIN_THRESHOLD = 0.3
+MAX_THRESHOLD = 0.65
+# Safety gap kept below the nearest impostor distance.
+IMPOSTOR_MARGIN = 0.02
+
+def _argmin_columns(squared, group=32):
+    """
+    np.argmin(squared, axis=0) without its slow strided scan down every column:
+    take the (vectorized) minimum of each group of rows first, then search
+    only the winning group of each column.
+    """
+    rows, cols = squared.shape
+    if rows % group:
+        return np.argmin(squared, axis=0)
+    grouped = squared.reshape(rows // group, group, cols)
+    best_group = np.argmin(grouped.min(axis=1), axis=0)
+    columns = np.arange(cols)
+    return best_group * group + np.argmin(grouped[best_group, :, columns], axis=1)
+
+def _row_block_statistics(encodings, squared_norms, labels, start, stop, block_size):
+    """
+    Compare rows [start, stop) against themselves and every later row, one
+    column block at a time.
+
+    Distances are symmetric, so only the upper triangle of block pairs is
+    computed: each off-diagonal block updates the nearest impostor of its rows
+    and of its columns. Only a (stop - start) x block_size distance block is
+    alive at once, which bounds memory regardless of gallery size.
+
+    Returns:
+        tuple: (start, nearest impostor distance and row index for every row from
+                start to the end of the gallery, labels of intra-student pairs,
+                distances of intra-student pairs).
+    """
+    rows = encodings[start:stop]
+    row_labels = labels[start:stop]
+    row_ids = np.arange(start, stop)
+    best = np.full(len(encodings) - start, np.inf, dtype=np.float32)
+    best_index = np.full(len(encodings) - start, -1, dtype=np.int64)
+    intra_labels = []
+    intra_distances = []
+
+    for col_start in range(start, len(encodings), block_size):
+        col_stop = min(col_start + block_size, len(encodings))
+        col_labels = labels[col_start:col_stop]
+        # ||x||^2 + ||y||^2 - 2 x.y, built in place on the product.
+        squared = rows @ encodings[col_start:col_stop].T
+        squared *= -2.0
+        squared += squared_norms[start:stop, None]
+        squared += squared_norms[None, col_start:col_stop]
+        np.maximum(squared, 0.0, out=squared)
+
+        # Labels are sorted, so blocks whose label ranges do not overlap hold
+        # no same-student pairs and can skip the mask entirely.
+        if row_labels[0] <= col_labels[-1] and col_labels[0] <= row_labels[-1]:
+            same = row_labels[:, None] == col_labels[None, :]
+            upper = row_ids[:, None] < np.arange(col_start, col_stop)[None, :]
+            pairs = np.nonzero(same & upper)
+            if len(pairs[0]):
+                intra_labels.append(row_labels[pairs[0]])
+                intra_distances.append(np.sqrt(squared[pairs]))
+            squared[same] = np.inf
+
+        nearest = np.argmin(squared, axis=1)
+        nearest_squared = squared[np.arange(len(nearest)), nearest]
+        own = slice(0, stop - start)
+        better = nearest_squared < best[own]
+        best[own][better] = nearest_squared[better]
+        best_index[own][better] = nearest[better] + col_start
+
+        if col_start != start:
+            # The mirrored block (columns against these rows) is never computed,
+            # so take the columns' nearest rows from this one.
+            nearest = _argmin_columns(squared)
+            nearest_squared = squared[nearest, np.arange(len(nearest))]
+            cols = slice(col_start - start, col_stop - start)
+            better = nearest_squared < best[cols]
+            best[cols][better] = nearest_squared[better]
+            best_index[cols][better] = nearest[better] + start
+
+    return start, np.sqrt(best), best_index, intra_labels, intra_distances
+
+def pairwise_statistics(encodings, labels, block_size=2048, workers=None):
+    """
+    Blocked, multithreaded N x N distance pass over the gallery, computing
+    only the upper triangle of blocks.
+
+    Args:
+        encodings (np.ndarray): Encodings of shape (N, 128), grouped by student.
+        labels (np.ndarray): Sorted student index of each encoding.
+        block_size (int): Rows and columns per distance block.
+        workers (int): Threads; the matrix products release the GIL.
+
+    Returns:
+        tuple: (nearest impostor distance per encoding, nearest impostor row index,
+                intra-student pair labels, intra-student pair distances).
+    """
+    encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+    labels = np.asarray(labels)
+    squared_norms = np.einsum('ij,ij->i', encodings, encodings)
+    impostor = np.full(len(encodings), np.inf, dtype=np.float32)
+    impostor_index = np.full(len(encodings), -1, dtype=np.int64)
+    intra_labels = []
+    intra_distances = []
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        # The first row blocks have the most column blocks left, so they are
+        # submitted first.
+        futures = [
+            executor.submit(_row_block_statistics, encodings, squared_norms, labels,
+                            start, min(start + block_size, len(encodings)), block_size)
+            for start in range(0, len(encodings), block_size)
+        ]
+        for future in futures:
+            start, best, best_index, pair_labels, pair_distances = future.result()
+            better = best < impostor[start:]
+            impostor[start:][better] = best[better]
+            impostor_index[start:][better] = best_index[better]
+            intra_labels.extend(pair_labels)
+            intra_distances.extend(pair_distances)
+
+    if intra_labels:
+        intra_labels = np.concatenate(intra_labels)
+        intra_distances = np.concatenate(intra_distances)
+    else:
+        intra_labels = np.empty(0, dtype=labels.dtype)
+        intra_distances = np.empty(0, dtype=np.float32)
+    return impostor, impostor_index, intra_labels, intra_distances
+
+def choose_threshold(genuine, impostor):
+    """
+    Pick an acceptance threshold between a student's own spread and their
+    closest impostor.
+
+    Args:
+        genuine (float or None): 95th percentile of intra-student distances
+                                 (None with a single sample).
+        impostor (float): Distance to the nearest other student's encoding.
+
+    Returns:
+        float: The threshold. It stays IMPOSTOR_MARGIN below the impostor unless
+               MIN_THRESHOLD forces it higher (see the 'impostor_accepted' stat).
+    """
+    upper = impostor - IMPOSTOR_MARGIN
+    if genuine is None:
+        threshold = min(DEFAULT_TOLERANCE, upper)
+    elif np.isfinite(impostor):
+        threshold = min((genuine + impostor) / 2.0, upper)
+    else:
+        threshold = max(DEFAULT_TOLERANCE, genuine + IMPOSTOR_MARGIN)
+    return float(min(max(threshold, MIN_THRESHOLD), MAX_THRESHOLD))
+
+def calibrate_thresholds(student_data, block_size=2048, workers=None):
+    """
+    Compute intra-student and nearest-impostor distance distributions and a
+    per-student threshold for every enrolled student.
+
+    Returns:
+        dict: {'thresholds': {enrollment_id: threshold}, 'stats': {enrollment_id: {...}}}
+    """
+    student_data = [data for data in student_data if len(data['encodings'])]
+    encodings = np.concatenate([np.asarray(data['encodings'], dtype=np.float64).reshape(-1, ENCODING_DIM)
+                                for data in student_data]) if student_data else np.empty((0, ENCODING_DIM))
+    labels = np.repeat(np.arange(len(student_data)), [len(data['encodings']) for data in student_data])
+    if len(encodings) == 0:
+        return {'thresholds': {}, 'stats': {}}
+
+    impostor, impostor_index, intra_labels, intra_distances = pairwise_statistics(
+        encodings, labels, block_size, workers)
+
+    order = np.argsort(intra_labels, kind='stable')
+    intra_labels = intra_labels[order]
+    intra_distances = intra_distances[order]
+    bounds = np.searchsorted(intra_labels, np.arange(len(student_data) + 1))
+    row_bounds = np.searchsorted(labels, np.arange(len(student_data) + 1))
+
+    thresholds = {}
+    stats = {}
+    for index, data in enumerate(student_data):
+        own = intra_distances[bounds[index]:bounds[index + 1]]
+        rows = slice(row_bounds[index], row_bounds[index + 1])
+        nearest_row = int(np.argmin(impostor[rows])) + row_bounds[index]
+        nearest_impostor = float(impostor[nearest_row])
+        genuine = float(np.percentile(own, 95)) if len(own) else None
+        threshold = choose_threshold(genuine, nearest_impostor)
+        thresholds[data['enrollment_id']] = threshold
+        stats[data['enrollment_id']] = {
+            'name': data['name'],
+            'samples': int(rows.stop - rows.start),
+            'intra_median': float(np.median(own)) if len(own) else None,
+            'intra_p95': genuine,
+            'nearest_impostor': nearest_impostor,
+            'nearest_impostor_id': (student_data[labels[impostor_index[nearest_row]]]['enrollment_id']
+                                    if np.isfinite(nearest_impostor) else None),
+            'threshold': threshold,
+            # MIN_THRESHOLD overrode the impostor cap: the look-alike is accepted.
+            'impostor_accepted': threshold >= nearest_impostor
+        }
+    return {'thresholds': thresholds, 'stats': stats}
+
+def save_thresholds(calibration, file_path=DEFAULT_THRESHOLDS_PATH):
+    """
+    Save calibrated thresholds where Gallery.from_directory picks them up.
+    """
+    with open(file_path, 'wb') as f:
+        pickle.dump(dict(calibration, calibrated_at=datetime.now().isoformat(timespec='seconds')), f)
+    return file_path
+
+def print_summary(calibration, limit=10):
+    stats = list(calibration['stats'].values())
+    if not stats:
+        print("No encodings to calibrate.")
+        return
+    thresholds = np.array([s['threshold'] for s in stats])
+    print(f"{len(stats)} students | threshold min {thresholds.min():.3f} | "
+          f"median {np.median(thresholds):.3f} | max {thresholds.max():.3f}")
+    overlapping = [s for s in stats if s['intra_p95'] is not None and s['intra_p95'] >= s['nearest_impostor']]
+    print(f"{len(overlapping)} students have an impostor closer than their own 95th percentile distance.")
+    accepted = [s for s in stats if s['impostor_accepted']]
+    if accepted:
+        print(f"{len(accepted)} students have an impostor within the minimum threshold {MIN_THRESHOLD} "
+              f"and will accept it; consider re-enrolling them:")
+        for s in sorted(accepted, key=lambda s: s['nearest_impostor'])[:limit]:
+            print(f"  {s['name']} vs {s['nearest_impostor_id']}: impostor {s['nearest_impostor']:.3f}, "
+                  f"threshold {s['threshold']:.3f}")
+    print("Closest look-alikes:")
+    for s in sorted(stats, key=lambda s: s['nearest_impostor'])[:limit]:
+        print(f"  {s['name']} vs {s['nearest_impostor_id']}: impostor {s['nearest_impostor']:.3f}, "
+              f"threshold {s['threshold']:.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibrate per-student match thresholds.")
+    parser.add_argument('--students', default='../data/students')
+    parser.add_argument('--output', default=DEFAULT_THRESHOLDS_PATH)
+    parser.add_argument('--block-size', type=int, default=2048)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Calibrate this many synthetic students instead (nothing is saved).")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        student_data = synthetic_student_data(args.synthetic)
+    else:
+        student_data = load_student_data(args.students)
+    started = time.perf_counter()
+    calibration = calibrate_thresholds(student_data, args.block_size, args.workers)
+    print(f"Calibrated {sum(len(d['encodings']) for d in student_data)} encodings "
+          f"in {time.perf_counter() - started:.2f} s.")
+    print_summary(calibration)
+    if not args.synthetic:
+        print("Thresholds saved to", save_thresholds(calibration, args.output))
@@ -0,0 +1,193 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import face_recognition
+
+# Below this many faces per frame the IPC round trip costs more than it saves,
+# so the faces are encoded in the calling process.
+MIN_PARALLEL_FACES = 4
+
+# Per-worker state: shared-memory blocks attached by name.
+_attached_buffers = {}
+
+def _init_worker():
+    """
+    Warm up the dlib models once per worker process so the first frame does
+    not pay for model loading.
+    """
+    dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_encodings(dummy, [(8, 56, 56, 8)])
+
+def _attach_frame(buffer_name, shape, dtype):
+    shm = _attached_buffers.get(buffer_name)
+    if shm is None:
+        for stale in _attached_buffers.values():
+            stale.close()
+        _attached_buffers.clear()
+        # Spawned workers share the parent's resource tracker, so attaching
+        # does not take ownership; the parent unlinks the block in close().
+        shm = shared_memory.SharedMemory(name=buffer_name)
+        _attached_buffers[buffer_name] = shm
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _encode_chunk(buffer_name, shape, dtype, face_locations, num_jitters, model):
+    frame = _attach_frame(buffer_name, shape, dtype)
+    return face_recognition.face_encodings(frame, face_locations, num_jitters=num_jitters, model=model)
+
+def _detect_chunk(buffer_name, shape, dtype, regions, upsample, model):
+    frame = _attach_frame(buffer_name, shape, dtype)
+    return [_detect_region(frame, region, upsample, model) for region in regions]
+
+def _detect_region(frame, region, upsample, model):
+    top, right, bottom, left = region
+    tile = np.ascontiguousarray(frame[top:bottom, left:right])
+    locations = face_recognition.face_locations(tile, number_of_times_to_upsample=upsample, model=model)
+    # Shift tile coordinates back into frame coordinates.
+    return [(t + top, r + left, b + top, l + left) for t, r, b, l in locations]
+
+class EncoderPool:
+    """
+    Pool of worker processes with the face_recognition models preloaded.
+
+    A frame is copied once into a shared-memory buffer that every worker maps,
+    then its face locations (or detection regions) are split into contiguous
+    chunks across the workers. Results come back in input order.
+    """
+
+    def __init__(self, workers=None, num_jitters=1, model='small'):
+        """
+        Args:
+            workers (int): Number of worker processes (defaults to the CPU count).
+            num_jitters (int): Passed through to face_recognition.face_encodings.
+            model (str): Landmark model passed through to face_recognition.face_encodings.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.num_jitters = num_jitters
+        self.model = model
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self._buffer = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def warm_up(self):
+        """
+        Start every worker process and wait until its models are loaded, so
+        the first frame is not charged for process startup.
+        """
+        for future in [self._executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def _share_frame(self, frame):
+        frame = np.ascontiguousarray(frame)
+        if self._buffer is None or self._buffer.size < frame.nbytes:
+            self._release_buffer()
+            self._buffer = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        shared = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._buffer.buf)
+        shared[...] = frame
+        return self._buffer.name, frame.shape, frame.dtype.str
+
+    def _release_buffer(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer.unlink()
+            self._buffer = None
+
+    def _map_chunks(self, function, frame, items, *args):
+        chunks = [list(chunk) for chunk in np.array_split(np.arange(len(items)), min(self.workers, len(items)))]
+        # One frame in flight at a time: the shared buffer is reused between calls.
+        with self._lock:
+            buffer_name, shape, dtype = self._share_frame(frame)
+            futures = [
+                self._executor.submit(function, buffer_name, shape, dtype,
+                                      [tuple(items[i]) for i in chunk], *args)
+                for chunk in chunks if chunk
+            ]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        return results
+
+    def face_encodings(self, rgb_frame, face_locations):
+        """
+        Drop-in replacement for face_recognition.face_encodings that spreads
+        the faces of one frame across the worker processes.
+
+        Args:
+            rgb_frame (np.ndarray): RGB image.
+            face_locations (list): (top, right, bottom, left) tuples.
+
+        Returns:
+            list: One 128-d encoding per face location, in input order.
+        """
+        if len(face_locations) < MIN_PARALLEL_FACES or self.workers == 1:
+            return face_recognition.face_encodings(rgb_frame, face_locations,
+                                                   num_jitters=self.num_jitters, model=self.model)
+        return self._map_chunks(_encode_chunk, rgb_frame, face_locations, self.num_jitters, self.model)
+
+    def face_locations_in_regions(self, rgb_frame, regions, upsample=1, model='hog'):
+        """
+        Run face detection on several regions of one frame in parallel.
+
+        Args:
+            rgb_frame (np.ndarray): RGB image.
+            regions (list): (top, right, bottom, left) regions, e.g. overlapping tiles.
+            upsample (int): Passed as number_of_times_to_upsample to face_recognition.face_locations.
+            model (str): Detector passed through to face_recognition.face_locations.
+
+        Returns:
+            list: For each region, its face locations in full-frame coordinates.
+        """
+        if self.workers == 1 or len(regions) < 2:
+            return [_detect_region(rgb_frame, region, upsample, model) for region in regions]
+        return self._map_chunks(_detect_chunk, rgb_frame, regions, upsample, model)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._release_buffer()
+
+def benchmark(face_counts=(10, 40), worker_counts=None, repeats=3):
+    """
+    Time encoding a synthetic crowded frame at increasing worker counts.
+    """
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+    for faces in face_counts:
+        locations = []
+        for i in range(faces):
+            top = 20 + (i // 10) * 200
+            left = 20 + (i % 10) * 180
+            locations.append((top, left + 150, top + 150, left))
+        baseline = None
+        for workers in worker_counts:
+            with EncoderPool(workers) as pool:
+                pool.face_encodings(frame, locations)  # Warm up the workers.
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    pool.face_encodings(frame, locations)
+                elapsed = (time.perf_counter() - started) / repeats
+            baseline = baseline or elapsed
+            print(f"{faces:>3} faces | {workers:>2} workers | {elapsed * 1000.0:8.1f} ms/frame | "
+                  f"speedup {baseline / elapsed:4.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the face encoder worker pool.")
+    parser.add_argument('--faces', default='10,40')
+    parser.add_argument('--workers', default=None, help="Comma separated worker counts.")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    benchmark([int(f) for f in args.faces.split(',')],
+              [int(w) for w in args.workers.split(',')] if args.workers else None,
+              args.repeats)
@@ -0,0 +1,295 @@
+import threading
+import time
+import traceback
+from datetime import datetime
+import cv2
+import face_recognition
+from encoder_pool import EncoderPool
+from frame_buffers import FrameBufferPool
+from gallery import Gallery
+from matcher_service import MatcherClient
+from recognize import mark_attendance, process_frame, draw_matches
+
+STOPPED = "Stopped"
+RUNNING = "Running"
+PAUSED = "Paused"
+
+class _MatcherLost(Exception):
+    """
+    The matcher service connection failed during a match.
+    """
+
+class _ServiceMatcher:
+    """
+    MatcherClient wrapper that reports socket failures as _MatcherLost, so
+    they are not confused with other OSErrors (e.g. an attendance workbook
+    that is open in Excel).
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def match(self, face_encodings, tolerance=None):
+        try:
+            return self.client.match(face_encodings, tolerance)
+        except OSError as e:
+            raise _MatcherLost(e) from e
+
+    def close(self):
+        self.client.close()
+
+class RecognitionEngine:
+    """
+    Long-lived recognizer that keeps the gallery, models and camera warm
+    between sessions.
+
+    One background thread owns the camera. start(), pause(), resume(), stop()
+    and set_subject() only flip state that the thread reads every frame, so
+    they return immediately and take effect on the next frame. While stopped
+    or paused the camera keeps grabbing (without decoding) so the first frame
+    after a restart is fresh.
+    """
+
+    def __init__(self, video_source=0, student_dir='../data/students', precision='float64',
+                 tolerance=None, encoder_workers=0, attendance_dir='../data',
+                 show_window=True, matcher_address=None):
+        """
+        Args:
+            video_source (int or str): Video source (default is 0 for webcam).
+            student_dir (str): Directory of enrolled students.
+            precision (str): Gallery storage precision.
+            tolerance (float): Largest distance still accepted as a match (None uses the
+                               gallery's or matcher service's default).
+            encoder_workers (int): Encoder worker processes (0 encodes in this thread).
+            attendance_dir (str): Directory where attendance files are stored.
+            show_window (bool): Show the annotated camera feed while running.
+            matcher_address (str): Address of a running matcher_service. When given,
+                                   encodings are matched there instead of in a local gallery.
+        """
+        self.video_source = video_source
+        self.student_dir = student_dir
+        self.precision = precision
+        self.tolerance = tolerance
+        self.encoder_workers = encoder_workers
+        self.attendance_dir = attendance_dir
+        self.show_window = show_window
+        self.matcher_address = matcher_address
+        self.state = STOPPED
+        self.subject = None
+        # Local Gallery, or None in client mode.
+        self.gallery = None
+        # What frames are matched against: the gallery or a MatcherClient.
+        self.matcher = None
+        # Students already marked, per (subject, date), kept across restarts.
+        self.recognized_students = {}
+        self._encoder_pool = None
+        self._video_capture = None
+        self._frame_buffers = FrameBufferPool()
+        self._thread = None
+        self._camera_wanted = False
+        self._shutdown = threading.Event()
+        self._release_camera = threading.Event()
+        self._camera_released = threading.Event()
+        self._window_open = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """
+        Load the gallery and models and start the camera thread. Called by
+        start() if needed; call it early to hide the load time.
+        """
+        if self._shutdown.is_set() and self._thread is not None:
+            # A timed-out shutdown(): let the old thread finish its frame and
+            # release its resources (under the lock) before starting again.
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self.matcher is None:
+                if self.matcher_address:
+                    self.matcher = _ServiceMatcher(MatcherClient(self.matcher_address))
+                else:
+                    self.gallery = Gallery.from_directory(self.student_dir, precision=self.precision)
+                    self.matcher = self.gallery
+            if self.encoder_workers and self._encoder_pool is None:
+                self._encoder_pool = EncoderPool(self.encoder_workers)
+                self._encoder_pool.warm_up()
+            self._camera_wanted = True
+            if self._thread is None or not self._thread.is_alive():
+                self._shutdown.clear()
+                self._thread = threading.Thread(target=self._run, name='recognition-engine', daemon=True)
+                self._thread.start()
+
+    @property
+    def ready(self):
+        """
+        True once the gallery or matcher connection is loaded.
+        """
+        return self.matcher is not None
+
+    def reload_gallery(self):
+        """
+        Rebuild the gallery (e.g. after enrolling or deleting a student) and
+        swap it in without interrupting recognition.
+        """
+        if self.matcher_address:
+            print("Gallery is served by the matcher service; restart it to pick up changes.")
+            return
+        gallery = Gallery.from_directory(self.student_dir, precision=self.precision)
+        self.gallery = gallery
+        self.matcher = gallery
+
+    def start(self, subject):
+        self.warm_up()
+        self.subject = subject
+        self.state = RUNNING
+        print("Recognition running for subject:", subject)
+
+    def set_subject(self, subject):
+        self.subject = subject
+        print("Recognition subject switched to:", subject)
+
+    def pause(self):
+        if self.state == RUNNING:
+            self.state = PAUSED
+
+    def resume(self):
+        if self.state == PAUSED:
+            self.state = RUNNING
+
+    def stop(self):
+        self.state = STOPPED
+
+    def release_camera(self, timeout=2.0):
+        """
+        Stop and hand the camera back (e.g. for enrollment). The next start()
+        reopens it; the gallery and models stay loaded.
+        """
+        self.state = STOPPED
+        self._camera_wanted = False
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._camera_released.clear()
+        self._release_camera.set()
+        self._camera_released.wait(timeout)
+
+    def shutdown(self, timeout=2.0):
+        """
+        Stop the camera thread and free the camera and worker processes.
+
+        If the thread is still busy with a frame after timeout, it frees them
+        itself once it sees the shutdown.
+        """
+        self.state = STOPPED
+        self._shutdown.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return
+            self._thread = None
+        self._release_resources()
+
+    def _release_resources(self):
+        with self._lock:
+            if self._encoder_pool is not None:
+                self._encoder_pool.close()
+                self._encoder_pool = None
+            self._close_matcher()
+
+    def _close_matcher(self):
+        if self.matcher_address and self.matcher is not None:
+            self.matcher.close()
+        self.matcher = None
+        self.gallery = None
+
+    def _close_window(self):
+        if self._window_open:
+            cv2.destroyWindow('Attendance Recognition')
+            cv2.waitKey(1)
+            self._window_open = False
+
+    def _run(self):
+        try:
+            while not self._shutdown.is_set():
+                if self._release_camera.is_set():
+                    self._close_window()
+                    if self._video_capture is not None:
+                        self._video_capture.release()
+                        self._video_capture = None
+                    self._release_camera.clear()
+                    self._camera_released.set()
+
+                if not self._camera_wanted:
+                    # Camera handed back; nothing to keep warm until the next start().
+                    time.sleep(0.02)
+                    continue
+
+                if self._video_capture is None:
+                    self._video_capture = cv2.VideoCapture(self.video_source)
+
+                if self.state != RUNNING:
+                    self._close_window()
+                    # grab() waits for the next frame without decoding it, which
+                    # keeps the stream current and paces this loop.
+                    if not self._video_capture.grab():
+                        time.sleep(0.05)
+                    continue
+
+                ret, frame = self._frame_buffers.read(self._video_capture)
+                if not ret:
+                    print("Failed to grab frame from webcam. Stopping recognition...")
+                    self.state = STOPPED
+                    continue
+                try:
+                    self._process_frame(frame)
+                except _MatcherLost as e:
+                    # The matcher service went away; the next start() reconnects.
+                    print("Matcher connection lost, stopping recognition:", e)
+                    self.state = STOPPED
+                    with self._lock:
+                        self._close_matcher()
+                except Exception:
+                    # Keep the thread (and the warm camera and gallery) alive,
+                    # but never report Running while nothing is recognized.
+                    traceback.print_exc()
+                    print("Recognition failed, stopping. Press Start to try again.")
+                    self.state = STOPPED
+        finally:
+            self._close_window()
+            if self._video_capture is not None:
+                self._video_capture.release()
+                self._video_capture = None
+            if self._shutdown.is_set():
+                self._release_resources()
+
+    def _process_frame(self, frame):
+        encode_faces = (self._encoder_pool.face_encodings if self._encoder_pool is not None
+                        else face_recognition.face_encodings)
+        face_locations, matches = process_frame(frame, self._frame_buffers, self.matcher,
+                                                encode_faces, self.tolerance)
+
+        # Re-read the state and subject so a pause or switch issued while this
+        # frame was being processed already applies to its marks.
+        subject = self.subject
+        marking = self.state == RUNNING
+        recognized = self.recognized_students.setdefault(
+            (subject, datetime.now().strftime('%Y-%m-%d')), set())
+
+        for student, _ in matches:
+            if marking and student is not None and student['enrollment_id'] not in recognized:
+                try:
+                    mark_attendance(student['name'], student['enrollment_id'], student.get('class', 'N/A'),
+                                    subject, attendance_dir=self.attendance_dir)
+                except OSError as e:
+                    # Usually the workbook is open in Excel; retried on a later frame.
+                    print(f"Could not mark attendance for {student['name']}, will retry:", e)
+                    continue
+                recognized.add(student['enrollment_id'])
+
+        if self.show_window:
+            draw_matches(frame, face_locations, matches)
+            cv2.putText(frame, f"Subject: {subject}", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
+            cv2.imshow('Attendance Recognition', frame)
+            self._window_open = True
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.stop()
@@ -1,8 +1,8 @@
 import cv2
 import face_recognition
-import numpy as np
 import pickle
 import os
+from frame_buffers import FrameBufferPool
 
 def enroll_student(student_name, enrollment_id, student_class, save_dir='../data/students', num_images=5):
     """
@@ -20,6 +20,7 @@ def enroll_student(student_name, enrollment_id, student_class, save_dir='../data
         os.makedirs(save_dir)
 
     video_capture = cv2.VideoCapture(0)
+    frame_buffers = FrameBufferPool()
     collected_encodings = []
 
     print(f"Enrolling student: {student_name} | Enrollment ID: {enrollment_id} | Class: {student_class}")
@@ -28,17 +29,14 @@ def enroll_student(student_name, enrollment_id, student_class, save_dir='../data
 
     count = 0
     while count < num_images:
-        ret, frame = video_capture.read()
+        ret, frame = frame_buffers.read(video_capture)
         if not ret:
             print("Failed to grab frame from webcam. Exiting...")
             break
 
-        # Resize frame for faster processing (scale factor 0.25)
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-
-        # Convert BGR (OpenCV default) to RGB (face_recognition uses RGB)
-        rgb_small_frame = small_frame[:, :, ::-1]
-        rgb_small_frame = np.ascontiguousarray(rgb_small_frame)
+        # Resize frame for faster processing (scale factor 0.25) and convert
+        # BGR (OpenCV default) to RGB (face_recognition uses RGB) in reused buffers
+        rgb_small_frame = frame_buffers.prepare(frame)
 
         # Detect face locations in the frame
         face_locations = face_recognition.face_locations(rgb_small_frame)
@@ -0,0 +1,178 @@
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+class FrameBufferPool:
+    """
+    Reusable per-camera frame buffers.
+
+    The capture frame, the downscaled frame and its RGB conversion are written
+    into arrays allocated once (and again only if the camera resolution
+    changes), using the dst arguments of VideoCapture.read, cv2.resize and
+    cv2.cvtColor. Arrays returned by read() and prepare() are overwritten by
+    the next call, so copy anything that must outlive the current frame.
+    """
+
+    def __init__(self, scale=0.25):
+        """
+        Args:
+            scale (float): Downscale factor applied by prepare().
+        """
+        self.scale = scale
+        self._frame = None
+        self._buffers = {}
+
+    def _buffer(self, key, shape, dtype=np.uint8):
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+    def read(self, video_capture):
+        """
+        Read the next frame into the reused capture buffer.
+
+        Returns:
+            tuple: (ret, frame) like VideoCapture.read.
+        """
+        if self._frame is None:
+            ret, frame = video_capture.read()
+        else:
+            ret, frame = video_capture.read(self._frame)
+        if ret:
+            self._frame = frame
+        return ret, frame
+
+    def prepare(self, frame):
+        """
+        Allocation-free equivalent of recognize.prepare_frame: resize the BGR frame by
+        self.scale and convert it to contiguous RGB without new allocations.
+        """
+        height, width = frame.shape[:2]
+        small_width = max(int(round(width * self.scale)), 1)
+        small_height = max(int(round(height * self.scale)), 1)
+        small_frame = self._buffer('small', (small_height, small_width, 3))
+        # dsize=(0, 0) with fx/fy keeps the exact interpolation of prepare_frame;
+        # the preallocated dst already has the size OpenCV computes.
+        cv2.resize(frame, (0, 0), dst=small_frame, fx=self.scale, fy=self.scale)
+        rgb_small_frame = self._buffer('rgb', (small_height, small_width, 3))
+        cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB, dst=rgb_small_frame)
+        return rgb_small_frame
+
+def _measure(step, frames, warmup=10):
+    """
+    Run step() for warmup + frames iterations and measure each steady-state frame.
+
+    step() must return every array it produced, so they are still alive when
+    the after-snapshot is taken.
+
+    Returns:
+        tuple: (mean allocations per frame, mean bytes of those allocations,
+                mean tracemalloc peak above the starting point, seconds per frame).
+    """
+    for _ in range(warmup):
+        step()
+    # Leave out tracemalloc's own bookkeeping, including the snapshots.
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    tracemalloc.start()
+    counts = []
+    sizes = []
+    peaks = []
+    for _ in range(frames):
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        result = step()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        # Filter only now, so the filtering itself is not counted.
+        stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'filename')
+        grown = [stat for stat in stats if stat.count_diff > 0]
+        counts.append(sum(stat.count_diff for stat in grown))
+        sizes.append(sum(stat.size_diff for stat in grown))
+        peaks.append(peak - current)
+        del result
+    tracemalloc.stop()
+
+    # Time separately: snapshots cost far more than a frame.
+    started = time.perf_counter()
+    for _ in range(frames):
+        step()
+    elapsed = time.perf_counter() - started
+    return float(np.mean(counts)), float(np.mean(sizes)), float(np.mean(peaks)), elapsed / frames
+
+def _looping_read(video_capture, read):
+    """
+    Read the next frame with read(video_capture), rewinding the file at its end.
+    """
+    ret, frame = read(video_capture)
+    if not ret:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        ret, frame = read(video_capture)
+    return frame
+
+def benchmark(frames=300, width=1920, height=1080, video=None):
+    """
+    Compare per-frame allocations of the original capture and prepare path
+    against the buffer pool.
+
+    Without a video the feed is synthetic: the legacy path copies the source
+    frame (what VideoCapture.read() returns) and the pooled path copies it
+    into a fixed buffer with np.copyto, standing in for
+    VideoCapture.read(buffer). Pass a video file to exercise the real
+    VideoCapture.read and FrameBufferPool.read instead.
+    """
+    pool = FrameBufferPool()
+
+    if video:
+        legacy_capture = cv2.VideoCapture(video)
+        pooled_capture = cv2.VideoCapture(video)
+
+        def legacy_read():
+            return _looping_read(legacy_capture, lambda capture: capture.read())
+
+        def pooled_read():
+            return _looping_read(pooled_capture, pool.read)
+    else:
+        rng = np.random.default_rng(0)
+        source = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        capture_frame = np.empty_like(source)
+
+        def legacy_read():
+            return source.copy()
+
+        def pooled_read():
+            np.copyto(capture_frame, source)
+            return capture_frame
+
+    def legacy_step():
+        # The original resize / channel flip / contiguous copy (recognize.prepare_frame).
+        frame = legacy_read()
+        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        return frame, small_frame, np.ascontiguousarray(small_frame[:, :, ::-1])
+
+    def pooled_step():
+        return pool.prepare(pooled_read())
+
+    for name, step in (('per-frame arrays', legacy_step), ('buffer pool', pooled_step)):
+        count, allocated, peak, seconds = _measure(step, frames)
+        print(f"{name:>16} | {count:6.1f} allocations/frame | {allocated / 1024.0:10.1f} KB/frame | "
+              f"peak {peak / 1024.0:10.1f} KB | {seconds * 1000.0:6.2f} ms/frame")
+
+    if video:
+        legacy_capture.release()
+        pooled_capture.release()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure per-frame allocations with and without the buffer pool.")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--video', default=None,
+                        help="Read frames from this video file instead of a synthetic feed.")
+    args = parser.parse_args()
+    benchmark(args.frames, args.width, args.height, args.video)
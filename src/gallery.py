@@ -0,0 +1,266 @@
+import os
+import pickle
+import numpy as np
+from utils import load_student_data
+
+# face_recognition produces 128-dimensional encodings and treats a distance
+# of 0.6 or less as a match.
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.6
+
+# Storage precisions for gallery encodings. float16 halves and int8 (with a
+# per-dimension scale) quarters the float32 footprint; float64 is what
+# face_recognition returns and is kept as the reference.
+PRECISIONS = ('float64', 'float16', 'int8')
+
+# Per-student acceptance thresholds written by calibrate.py.
+DEFAULT_THRESHOLDS_PATH = '../data/thresholds.pkl'
+
+# Quantized galleries are widened to float32 this many rows at a time, so the
+# working block stays in cache while the full gallery stays compact in memory.
+BLOCK_ROWS = 4096
+
+def quantize_encodings(encodings, precision):
+    """
+    Convert a float encoding matrix to the given storage precision.
+
+    Args:
+        encodings (np.ndarray): Encodings of shape (N, 128).
+        precision (str): One of PRECISIONS.
+
+    Returns:
+        tuple: (quantized matrix, per-dimension scale or None). For int8 the
+               original values are approximately quantized * scale.
+    """
+    encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+    if precision == 'float64':
+        return encodings, None
+    if precision == 'float16':
+        return encodings.astype(np.float16), None
+    if precision == 'int8':
+        max_abs = np.abs(encodings).max(axis=0) if len(encodings) else np.zeros(ENCODING_DIM)
+        scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        quantized = np.clip(np.rint(encodings / scale), -127, 127).astype(np.int8)
+        return quantized, scale
+    raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}.")
+
+def dequantize_encodings(encodings, scale=None):
+    """
+    Widen stored encodings back to float32.
+    """
+    widened = np.asarray(encodings, dtype=np.float32)
+    if scale is not None:
+        widened = widened * scale
+    return widened
+
+def load_thresholds(file_path=DEFAULT_THRESHOLDS_PATH):
+    """
+    Load per-student thresholds written by calibrate.py.
+
+    Returns:
+        dict: Enrollment ID -> threshold distance (empty if the file does not exist).
+    """
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)['thresholds']
+
+def synthetic_student_data(num_students=500, samples_per_student=5, seed=0, spread=0.1, noise=0.02):
+    """
+    Generate random student records shaped like load_student_data output,
+    for load testing and benchmarking without enrolled students.
+
+    Args:
+        spread (float): Per-dimension standard deviation of student centres.
+                        The default puts students about 1.1 apart.
+        noise (float): Per-dimension standard deviation of samples around their centre.
+    """
+    rng = np.random.default_rng(seed)
+    student_data = []
+    for i in range(num_students):
+        center = rng.normal(0.0, spread, ENCODING_DIM)
+        student_data.append({
+            'name': f"Student {i}",
+            'enrollment_id': f"{i:011d}",
+            'class': 'N/A',
+            'encodings': list(center + rng.normal(0.0, noise, (samples_per_student, ENCODING_DIM)))
+        })
+    return student_data
+
+class Gallery:
+    """
+    All enrolled face encodings held as one matrix, so a whole frame of faces
+    can be matched with a single matrix search instead of one
+    face_recognition.face_distance call per face.
+    """
+
+    def __init__(self, student_data, precision='float64'):
+        """
+        Args:
+            student_data (list): Student dictionaries as returned by load_student_data.
+            precision (str): Storage precision for the encodings, one of PRECISIONS.
+        """
+        encodings = []
+        student_info = []
+        for data in student_data:
+            encodings.extend(data['encodings'])
+            student_info.extend([
+                {
+                    'name': data['name'],
+                    'enrollment_id': data['enrollment_id'],
+                    'class': data.get('class', 'N/A')
+                }
+            ] * len(data['encodings']))
+        encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        self._set_encodings(*quantize_encodings(encodings, precision), precision, student_info)
+
+    def _set_encodings(self, encodings, scale, precision, student_info):
+        self.precision = precision
+        self.encodings = encodings
+        self.scale = scale
+        self.student_info = student_info
+        self.row_thresholds = None
+        if precision == 'float64':
+            self._squared_norms = np.einsum('ij,ij->i', encodings, encodings)
+        else:
+            # Norms of the dequantized values, so distances stay consistent
+            # with the stored (rounded) encodings.
+            self._squared_norms = np.empty(len(encodings), dtype=np.float32)
+            for start in range(0, len(encodings), BLOCK_ROWS):
+                block = dequantize_encodings(encodings[start:start + BLOCK_ROWS], scale)
+                self._squared_norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+
+    @classmethod
+    def from_directory(cls, directory='../data/students', precision='float64',
+                       thresholds_path=DEFAULT_THRESHOLDS_PATH):
+        """
+        Build a gallery from the student .pkl files in a directory, applying
+        calibrated per-student thresholds when a thresholds file exists.
+        """
+        gallery = cls(load_student_data(directory), precision=precision)
+        if thresholds_path:
+            gallery.apply_thresholds(load_thresholds(thresholds_path))
+        return gallery
+
+    def apply_thresholds(self, thresholds):
+        """
+        Use per-student acceptance thresholds instead of the global tolerance.
+
+        Args:
+            thresholds (dict): Enrollment ID -> threshold distance. Students
+                               without an entry keep the tolerance passed to match().
+        """
+        if not thresholds:
+            self.row_thresholds = None
+            return
+        self.row_thresholds = np.array([thresholds.get(info['enrollment_id'], np.nan)
+                                        for info in self.student_info], dtype=np.float64)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Load a gallery previously written with save().
+        """
+        with open(file_path, 'rb') as f:
+            data = pickle.load(f)
+        gallery = cls.__new__(cls)
+        gallery._set_encodings(data['encodings'], data['scale'], data['precision'], data['student_info'])
+        gallery.row_thresholds = data.get('row_thresholds')
+        return gallery
+
+    def save(self, file_path):
+        """
+        Save the gallery, in its storage precision, to a single pickle file.
+        """
+        with open(file_path, 'wb') as f:
+            pickle.dump({
+                'precision': self.precision,
+                'encodings': self.encodings,
+                'scale': self.scale,
+                'student_info': self.student_info,
+                'row_thresholds': self.row_thresholds
+            }, f)
+
+    def __len__(self):
+        return len(self.student_info)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the stored encodings, norms and scale.
+        """
+        total = self.encodings.nbytes + self._squared_norms.nbytes
+        if self.scale is not None:
+            total += self.scale.nbytes
+        return total
+
+    def distances(self, face_encodings):
+        """
+        Euclidean distance from every query encoding to every gallery encoding.
+
+        Args:
+            face_encodings (array-like): Query encodings, shape (M, 128).
+
+        Returns:
+            np.ndarray: Distance matrix of shape (M, N). float64 for float64
+                        galleries and float32 for quantized ones.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if self.precision == 'float64':
+            query_norms = np.einsum('ij,ij->i', queries, queries)
+            squared = query_norms[:, None] + self._squared_norms[None, :] - 2.0 * (queries @ self.encodings.T)
+        else:
+            queries = queries.astype(np.float32)
+            query_norms = np.einsum('ij,ij->i', queries, queries)
+            # For int8, x . (q * s) == (x * s) . q, so scale the few queries
+            # rather than every gallery row.
+            scaled = queries * self.scale if self.scale is not None else queries
+            dots = np.empty((len(queries), len(self)), dtype=np.float32)
+            block = np.empty((min(BLOCK_ROWS, len(self)), ENCODING_DIM), dtype=np.float32)
+            for start in range(0, len(self), BLOCK_ROWS):
+                stop = min(start + BLOCK_ROWS, len(self))
+                view = block[:stop - start]
+                view[...] = self.encodings[start:stop]
+                dots[:, start:stop] = scaled @ view.T
+            squared = query_norms[:, None] + self._squared_norms[None, :] - 2.0 * dots
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def nearest(self, face_encodings):
+        """
+        Index of and distance to the closest gallery encoding for each query.
+
+        Returns:
+            tuple: (indices, distances) arrays of length M.
+        """
+        distances = self.distances(face_encodings)
+        best = np.argmin(distances, axis=1)
+        return best, distances[np.arange(len(best)), best]
+
+    def match(self, face_encodings, tolerance=DEFAULT_TOLERANCE):
+        """
+        Find the closest enrolled student for each query encoding.
+
+        Args:
+            face_encodings (array-like): Query encodings, shape (M, 128).
+            tolerance (float or array-like): Largest distance still accepted as a
+                               match, for students without a calibrated threshold.
+                               An array gives one tolerance per query.
+
+        Returns:
+            list: One (student_info or None, distance) tuple per query encoding.
+                  The student is None when no gallery encoding is within tolerance.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(self) == 0:
+            return [(None, float('inf'))] * len(queries)
+        best, best_distances = self.nearest(queries)
+        limits = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), best.shape)
+        if self.row_thresholds is not None:
+            calibrated = self.row_thresholds[best]
+            limits = np.where(np.isnan(calibrated), limits, calibrated)
+        results = []
+        for index, distance, limit in zip(best, best_distances, limits):
+            student = self.student_info[index] if distance <= limit else None
+            results.append((student, float(distance)))
+        return results
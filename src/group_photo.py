@@ -0,0 +1,187 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from encoder_pool import EncoderPool
+from gallery import Gallery, DEFAULT_TOLERANCE, PRECISIONS
+from recognize import mark_attendance_batch
+
+def tile_regions(height, width, tile_size=1024, overlap=192):
+    """
+    Split an image into overlapping square tiles.
+
+    The overlap should be larger than the biggest expected face so that every
+    face lies entirely inside at least one tile.
+
+    Returns:
+        list: (top, right, bottom, left) tile regions covering the image.
+    """
+    step = max(tile_size - overlap, 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(top, min(left + tile_size, width), min(top + tile_size, height), left)
+            for top in starts(height) for left in starts(width)]
+
+def merge_duplicate_faces(face_locations, overlap_threshold=0.5):
+    """
+    Non-maximum suppression for faces detected in more than one tile.
+
+    A face cut by a tile edge is only partially inside one of the boxes, so
+    boxes are compared by intersection over the smaller box's area rather
+    than IoU, and the larger box is kept.
+
+    Args:
+        face_locations (list): (top, right, bottom, left) boxes in frame coordinates.
+        overlap_threshold (float): Boxes overlapping more than this are duplicates.
+
+    Returns:
+        list: The surviving boxes.
+    """
+    if not face_locations:
+        return []
+    boxes = np.asarray(face_locations, dtype=np.float64)
+    top, right, bottom, left = boxes.T
+    areas = np.maximum(bottom - top, 0) * np.maximum(right - left, 0)
+    order = np.argsort(-areas)
+    keep = []
+    while len(order):
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+        inter_h = np.maximum(np.minimum(bottom[current], bottom[rest]) - np.maximum(top[current], top[rest]), 0)
+        inter_w = np.maximum(np.minimum(right[current], right[rest]) - np.maximum(left[current], left[rest]), 0)
+        smaller = np.maximum(np.minimum(areas[current], areas[rest]), 1.0)
+        order = rest[(inter_h * inter_w) / smaller <= overlap_threshold]
+    return [tuple(face_locations[i]) for i in sorted(keep)]
+
+def capture_still(video_source=0, width=3840, height=2160):
+    """
+    Grab a single high-resolution still from the camera.
+    """
+    video_capture = cv2.VideoCapture(video_source)
+    video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    # Let auto exposure settle before keeping a frame.
+    for _ in range(5):
+        ret, frame = video_capture.read()
+    video_capture.release()
+    return frame if ret else None
+
+def take_group_attendance(subject="Data Visualization", image_path=None, video_source=0, workers=None,
+                          tile_size=1024, overlap=192, upsample=1, precision='float64',
+                          tolerance=DEFAULT_TOLERANCE, attendance_dir='../data', annotated_path=None,
+                          notify=True, pool=None):
+    """
+    Take attendance for a whole room from one high-resolution photo.
+
+    The photo is split into overlapping tiles that are searched for faces in
+    parallel, duplicate detections at tile edges are merged, every face is
+    encoded and matched in one batch, and all marks are written at once.
+
+    Args:
+        subject (str): Subject to mark attendance for.
+        image_path (str): Photo to process. A still is captured from video_source when None.
+        video_source (int or str): Camera used when no image_path is given.
+        workers (int): Worker processes for detection and encoding (defaults to the CPU count).
+        tile_size (int): Tile edge length in pixels.
+        overlap (int): Overlap between neighbouring tiles in pixels.
+        upsample (int): HOG upsampling per tile; raise it to find smaller faces.
+        precision (str): Gallery storage precision.
+        tolerance (float): Largest distance still accepted as a match.
+        attendance_dir (str): Directory where attendance files are stored.
+        annotated_path (str): If given, save the photo with labelled boxes here.
+        notify (bool): Show the popup notification.
+        pool (EncoderPool): Warm pool to reuse across photos. When None a pool of
+                            `workers` processes is started for this photo and
+                            closed afterwards.
+
+    Returns:
+        dict: Face count, the newly marked and unknown counts, and per-step timings in
+              seconds ('pool' is worker startup, 0 when a pool is passed in).
+    """
+    timings = {}
+    started = time.perf_counter()
+    frame = cv2.imread(image_path) if image_path else capture_still(video_source)
+    if frame is None:
+        print("Could not read the group photo.")
+        return None
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    gallery = Gallery.from_directory(precision=precision)
+    timings['load'] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    own_pool = pool is None
+    if own_pool:
+        pool = EncoderPool(workers)
+        pool.warm_up()
+    timings['pool'] = time.perf_counter() - step
+
+    try:
+        step = time.perf_counter()
+        regions = tile_regions(rgb_frame.shape[0], rgb_frame.shape[1], tile_size, overlap)
+        per_tile = pool.face_locations_in_regions(rgb_frame, regions, upsample=upsample)
+        face_locations = merge_duplicate_faces([location for tile in per_tile for location in tile])
+        timings['detect'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        face_encodings = pool.face_encodings(rgb_frame, face_locations)
+        timings['encode'] = time.perf_counter() - step
+    finally:
+        if own_pool:
+            pool.close()
+
+    step = time.perf_counter()
+    matches = gallery.match(face_encodings, tolerance) if face_encodings else []
+    recognized = {}
+    for student, _ in matches:
+        if student is not None:
+            recognized.setdefault(student['enrollment_id'], student)
+    timings['match'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    newly_marked = mark_attendance_batch(list(recognized.values()), subject, attendance_dir, notify=notify)
+    timings['mark'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - started
+
+    if annotated_path:
+        for (top, right, bottom, left), (student, _) in zip(face_locations, matches):
+            name = student['name'] if student is not None else "Unknown"
+            rect_color = (0, 255, 0) if student is not None else (0, 0, 255)
+            cv2.rectangle(frame, (left, top), (right, bottom), rect_color, 2)
+            cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, rect_color, 2)
+        cv2.imwrite(annotated_path, frame)
+
+    unknown = sum(1 for student, _ in matches if student is None)
+    print(f"{len(regions)} tiles, {len(face_locations)} faces, {len(recognized)} recognized, "
+          f"{unknown} unknown, {len(newly_marked)} newly marked in {timings['total']:.2f} s.")
+    return {
+        'tiles': len(regions),
+        'faces': len(face_locations),
+        'recognized': len(recognized),
+        'newly_marked': len(newly_marked),
+        'unknown': unknown,
+        'timings': timings
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Take attendance for a whole room from one group photo.")
+    parser.add_argument('--subject', default="Data Visualization")
+    parser.add_argument('--image', default=None, help="Group photo; captured from the camera if omitted.")
+    parser.add_argument('--source', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tile-size', type=int, default=1024)
+    parser.add_argument('--overlap', type=int, default=192)
+    parser.add_argument('--upsample', type=int, default=1)
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64')
+    parser.add_argument('--annotated', default=None, help="Save the labelled photo to this path.")
+    args = parser.parse_args()
+    take_group_attendance(args.subject, args.image, args.source, args.workers, args.tile_size,
+                          args.overlap, args.upsample, args.precision, annotated_path=args.annotated,
+                          notify=False)
@@ -0,0 +1,159 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "Queued"
+RUNNING = "Running"
+DONE = "Done"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been cancelled."""
+
+
+class Job:
+    """
+    A unit of background work tracked by a JobRunner.
+
+    The job function receives the Job as its first argument and calls
+    report() to publish progress; report() raises JobCancelled once the job
+    has been cancelled, so long loops stop at their next progress update.
+    """
+
+    def __init__(self, job_id, name, runner, on_done=None):
+        self.id = job_id
+        self.name = name
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.on_done = on_done
+        self._runner = runner
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def report(self, progress=None, message=None):
+        """
+        Publish progress from inside the job function.
+
+        Args:
+            progress (float): Fraction complete between 0 and 1.
+            message (str): Short status text.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        self._runner._publish(self)
+
+
+class JobRunner:
+    """
+    Worker pool plus job registry for work that must stay off the Tk thread.
+
+    Jobs run on a small thread pool, so several queued jobs run concurrently.
+    Progress is collected in a thread-safe queue which the UI drains from its
+    own thread with poll_events().
+    """
+
+    def __init__(self, max_workers=3):
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._events = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, name, function, *args, on_done=None, **kwargs):
+        """
+        Queue function(job, *args, **kwargs) to run in the background.
+
+        Args:
+            name (str): Label shown in the UI.
+            function (callable): Job function; its return value becomes job.result.
+            on_done (callable): Called with the job once it has finished. It is
+                                not called by the runner itself but by whoever
+                                drains poll_events(), i.e. on the UI thread.
+
+        Returns:
+            Job: The registered job.
+        """
+        with self._lock:
+            job = Job(next(self._ids), name, self, on_done=on_done)
+            self.jobs[job.id] = job
+        self._publish(job)
+        self._executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Request cancellation. A queued job never starts; a running job stops
+        at its next progress report.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+            if job.status == QUEUED:
+                job.message = "Cancelling..."
+                self._publish(job)
+
+    def poll_events(self):
+        """
+        Return the jobs that changed since the last call, without blocking.
+        """
+        changed = {}
+        while True:
+            try:
+                job = self._events.get_nowait()
+            except queue.Empty:
+                break
+            changed[job.id] = job
+        return list(changed.values())
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def shutdown(self):
+        for job in self.active_jobs():
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _publish(self, job):
+        self._events.put(job)
+
+    def _run(self, job, function, args, kwargs):
+        if job.cancelled:
+            job.status = CANCELLED
+            job.message = "Cancelled before start"
+            self._publish(job)
+            return
+        job.status = RUNNING
+        self._publish(job)
+        try:
+            job.result = function(job, *args, **kwargs)
+            job.status = DONE
+            job.progress = 1.0
+            job.message = "Completed"
+        except JobCancelled:
+            job.status = CANCELLED
+            job.message = "Cancelled"
+        except Exception as e:
+            job.status = FAILED
+            job.error = e
+            job.message = str(e)
+        self._publish(job)
@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import time
+import numpy as np
+from gallery import Gallery, ENCODING_DIM, DEFAULT_TOLERANCE, PRECISIONS, synthetic_student_data
+
+# Wire format (both directions are length prefixed):
+#   request:  !IId header (count, dim, tolerance) followed by count*dim little-endian
+#             float64 values. A NaN tolerance means "use the server's tolerance".
+#   response: !I header (payload length) followed by a UTF-8 JSON list with one
+#             {"student": {...} or null, "distance": float} entry per encoding.
+REQUEST_HEADER = struct.Struct('!IId')
+RESPONSE_HEADER = struct.Struct('!I')
+ENCODING_WIRE_DTYPE = np.dtype('<f8')
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+def parse_address(address):
+    """
+    Parse a matcher address.
+
+    Args:
+        address (str): Either "host:port" for TCP or "unix:/path/to.sock" for a Unix socket.
+
+    Returns:
+        tuple: ('unix', path) or ('tcp', host, port).
+    """
+    if address.startswith('unix:'):
+        return ('unix', address[len('unix:'):])
+    host, _, port = address.rpartition(':')
+    return ('tcp', host or '127.0.0.1', int(port))
+
+def encode_request(face_encodings, tolerance=None):
+    queries = np.asarray(face_encodings, dtype=ENCODING_WIRE_DTYPE).reshape(-1, ENCODING_DIM)
+    tolerance = float('nan') if tolerance is None else float(tolerance)
+    return REQUEST_HEADER.pack(len(queries), ENCODING_DIM, tolerance) + queries.tobytes()
+
+def encode_response(results):
+    payload = json.dumps([{'student': student, 'distance': distance}
+                          for student, distance in results]).encode('utf-8')
+    return RESPONSE_HEADER.pack(len(payload)) + payload
+
+def decode_response(payload):
+    return [(item['student'], item['distance']) for item in json.loads(payload.decode('utf-8'))]
+
+
+class _PendingRequest:
+    def __init__(self, queries, tolerance, future):
+        self.queries = queries
+        self.tolerance = tolerance
+        self.future = future
+
+
+class MatcherServer:
+    """
+    Asyncio matching service holding one gallery in memory.
+
+    Requests that arrive within batch_window seconds of each other are
+    concatenated into a single matrix search, so many thin kiosks share one
+    gallery and one matrix multiply instead of each scanning the gallery.
+    """
+
+    def __init__(self, gallery, tolerance=DEFAULT_TOLERANCE, batch_window=0.002, max_batch=1024):
+        """
+        Args:
+            gallery (Gallery): Gallery to match against.
+            tolerance (float): Largest distance still accepted as a match.
+            batch_window (float): Seconds to wait for more requests before searching.
+            max_batch (int): Maximum number of encodings searched together.
+        """
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self, address=DEFAULT_ADDRESS):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        kind, *target = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(target[0]):
+                os.remove(target[0])
+            self._server = await asyncio.start_unix_server(self._handle_client, path=target[0])
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host=target[0], port=target[1])
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+
+    async def serve_forever(self, address=DEFAULT_ADDRESS):
+        server = await self.start(address)
+        print(f"Matcher serving {len(self.gallery)} encodings on {address}")
+        async with server:
+            await server.serve_forever()
+
+    async def match(self, face_encodings, tolerance=None):
+        """
+        Queue encodings for the next micro-batch and wait for their results.
+        A tolerance of None uses the server's tolerance.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_DIM)
+        if len(queries) == 0:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        tolerance = self.tolerance if tolerance is None else tolerance
+        await self._queue.put(_PendingRequest(queries, tolerance, future))
+        return await future
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                count, dim, tolerance = REQUEST_HEADER.unpack(header)
+                if dim != ENCODING_DIM:
+                    print(f"Rejecting request with {dim}-d encodings.")
+                    break
+                body = await reader.readexactly(count * dim * ENCODING_WIRE_DTYPE.itemsize)
+                queries = np.frombuffer(body, dtype=ENCODING_WIRE_DTYPE).reshape(count, dim)
+                results = await self.match(queries, None if np.isnan(tolerance) else tolerance)
+                writer.write(encode_response(results))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0].queries)
+            deadline = loop.time() + self.batch_window
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(pending)
+                rows += len(pending.queries)
+
+            matrix = np.concatenate([pending.queries for pending in batch])
+            tolerances = np.concatenate([np.full(len(pending.queries), pending.tolerance)
+                                         for pending in batch])
+            try:
+                # The matrix search releases the GIL, so keep it off the event loop.
+                results = await loop.run_in_executor(None, self.gallery.match, matrix, tolerances)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+            start = 0
+            for pending in batch:
+                end = start + len(pending.queries)
+                if not pending.future.done():
+                    pending.future.set_result(results[start:end])
+                start = end
+
+
+class MatcherClient:
+    """
+    Blocking client for MatcherServer with the same match() interface as Gallery,
+    so the recognizer can send encodings instead of loading the gallery itself.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=5.0):
+        kind, *target = parse_address(address)
+        if kind == 'unix':
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(target[0])
+        else:
+            self._sock = socket.create_connection((target[0], target[1]), timeout=timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def match(self, face_encodings, tolerance=None):
+        """
+        Match encodings on the server, with the same arguments and results as
+        Gallery.match. A tolerance of None uses the server's tolerance.
+        """
+        self._sock.sendall(encode_request(face_encodings, tolerance))
+        (length,) = RESPONSE_HEADER.unpack(self._recv_exactly(RESPONSE_HEADER.size))
+        return decode_response(self._recv_exactly(length))
+
+    def close(self):
+        self._sock.close()
+
+    def _recv_exactly(self, size):
+        chunks = []
+        while size:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                raise ConnectionError("Matcher closed the connection.")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+def synthetic_gallery(num_students=500, samples_per_student=5, seed=0, precision='float64'):
+    """
+    Build a gallery of random encodings, for load testing without enrolled students.
+    """
+    return Gallery(synthetic_student_data(num_students, samples_per_student, seed), precision=precision)
+
+async def _run_load_client(address, requests, batch_size, rng, latencies):
+    kind, *target = parse_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(target[0])
+    else:
+        reader, writer = await asyncio.open_connection(target[0], target[1])
+    try:
+        for _ in range(requests):
+            message = encode_request(rng.normal(0.0, 0.1, (batch_size, ENCODING_DIM)))
+            started = time.perf_counter()
+            writer.write(message)
+            await writer.drain()
+            (length,) = RESPONSE_HEADER.unpack(await reader.readexactly(RESPONSE_HEADER.size))
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+async def run_load(address=None, client_counts=(1, 2, 4, 8, 16, 32, 64), requests=200, batch_size=1,
+                   gallery=None, batch_window=0.002):
+    """
+    Measure matcher latency at increasing numbers of concurrent clients.
+
+    If no address is given, an in-process server is started on a temporary
+    Unix socket with the given (or a synthetic) gallery.
+
+    Returns:
+        list: One dict per client count with p50/p99 latency (ms) and throughput.
+    """
+    server = None
+    if address is None:
+        server = MatcherServer(gallery if gallery is not None else synthetic_gallery(),
+                               batch_window=batch_window)
+        address = f"unix:/tmp/matcher_loadgen_{os.getpid()}.sock"
+        await server.start(address)
+    rows = []
+    try:
+        for clients in client_counts:
+            latencies = []
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                _run_load_client(address, requests, batch_size, np.random.default_rng(i), latencies)
+                for i in range(clients)
+            ])
+            elapsed = time.perf_counter() - started
+            latency_ms = np.array(latencies) * 1000.0
+            row = {
+                'clients': clients,
+                'p50_ms': float(np.percentile(latency_ms, 50)),
+                'p99_ms': float(np.percentile(latency_ms, 99)),
+                'requests_per_s': len(latencies) / elapsed
+            }
+            rows.append(row)
+            print(f"{row['clients']:>4} clients | p50 {row['p50_ms']:7.2f} ms | "
+                  f"p99 {row['p99_ms']:7.2f} ms | {row['requests_per_s']:9.1f} req/s")
+    finally:
+        if server is not None:
+            await server.close()
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Shared face matching service.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subcommands.add_parser('serve', help="Serve the student gallery.")
+    serve_parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                              help="host:port or unix:/path/to.sock")
+    serve_parser.add_argument('--students', default='../data/students')
+    serve_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    serve_parser.add_argument('--precision', choices=PRECISIONS, default='float64')
+    serve_parser.add_argument('--batch-window-ms', type=float, default=2.0)
+
+    load_parser = subcommands.add_parser('loadgen', help="Report latency at increasing client counts.")
+    load_parser.add_argument('--address', default=None,
+                             help="Server to load; an in-process server is used if omitted.")
+    load_parser.add_argument('--clients', default='1,2,4,8,16,32,64')
+    load_parser.add_argument('--requests', type=int, default=200)
+    load_parser.add_argument('--batch-size', type=int, default=1)
+    load_parser.add_argument('--batch-window-ms', type=float, default=2.0)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = MatcherServer(Gallery.from_directory(args.students, args.precision), tolerance=args.tolerance,
+                               batch_window=args.batch_window_ms / 1000.0)
+        asyncio.run(server.serve_forever(args.address))
+    else:
+        asyncio.run(run_load(args.address, [int(c) for c in args.clients.split(',')],
+                             args.requests, args.batch_size,
+                             batch_window=args.batch_window_ms / 1000.0))
@@ -6,8 +6,12 @@ import os
 from datetime import datetime
 import pandas as pd
 import threading
+import time
 import tkinter as tk
-from utils import load_student_data
+from encoder_pool import EncoderPool
+from frame_buffers import FrameBufferPool
+from gallery import Gallery
+from matcher_service import MatcherClient
 
 # Global subject variable.
 SUBJECT = "Data Visualization"
@@ -32,7 +36,20 @@ def show_popup(message="Attendance Marked Successfully", duration=5000):
         root.mainloop()
     threading.Thread(target=popup, daemon=True).start()
 
-def mark_attendance(student_name, enrollment_id, student_class, subject, attendance_dir='../data'):
+ATTENDANCE_COLUMNS = ['Enrollment', 'Name', 'Class', 'Subject', 'Time Stamp']
+
+def _load_attendance_file(file_path):
+    """
+    Read an attendance file, or start an empty one if it is missing or unreadable.
+    """
+    if os.path.exists(file_path):
+        try:
+            return pd.read_excel(file_path)
+        except Exception as e:
+            print("Error reading the existing attendance file:", e)
+    return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+
+def mark_attendance(student_name, enrollment_id, student_class, subject, attendance_dir='../data', notify=True):
     """
     Mark the attendance of a student in an Excel file.
     The file is named with the current date and subject (e.g. attendance_Machine Learning_YYYY-MM-DD.xlsx)
@@ -44,6 +61,7 @@ def mark_attendance(student_name, enrollment_id, student_class, subject, attenda
         student_class (str): The class of the student.
         subject (str): Subject for which attendance is being marked.
         attendance_dir (str): Directory where attendance files are stored.
+        notify (bool): Show the popup notification (disable when running headless).
     """
     if not os.path.exists(attendance_dir):
         os.makedirs(attendance_dir)
@@ -57,23 +75,142 @@ def mark_attendance(student_name, enrollment_id, student_class, subject, attenda
         'Subject': subject,
         'Time Stamp': timestamp
     }
-    if os.path.exists(file_path):
-        try:
-            df = pd.read_excel(file_path)
-        except Exception as e:
-            print("Error reading the existing attendance file:", e)
-            df = pd.DataFrame(columns=['Enrollment', 'Name', 'Class', 'Subject', 'Time Stamp'])
-    else:
-        df = pd.DataFrame(columns=['Enrollment', 'Name', 'Class', 'Subject', 'Time Stamp'])
+    df = _load_attendance_file(file_path)
     if enrollment_id in df['Enrollment'].values:
         print(f"Attendance already marked for {student_name}.")
     else:
         df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
         df.to_excel(file_path, index=False)
         print(f"Attendance marked for {student_name} at {timestamp} for subject: {subject}")
-        show_popup()  # Display popup message
+        if notify:
+            show_popup()  # Display popup message
+
+def mark_attendance_batch(students, subject, attendance_dir='../data', notify=True):
+    """
+    Mark attendance for many students with a single read and a single write
+    of the attendance file.
+
+    Args:
+        students (list): Student dictionaries with 'name', 'enrollment_id' and 'class'.
+        subject (str): Subject for which attendance is being marked.
+        attendance_dir (str): Directory where attendance files are stored.
+        notify (bool): Show the popup notification (disable when running headless).
+
+    Returns:
+        list: The students that were newly marked.
+    """
+    if not os.path.exists(attendance_dir):
+        os.makedirs(attendance_dir)
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    file_path = os.path.join(attendance_dir, f"attendance_{subject}_{current_date}.xlsx")
+    timestamp = datetime.now().strftime('%I:%M:%S %p')
+    df = _load_attendance_file(file_path)
+    # Enrollment IDs read back from Excel may have been parsed as numbers.
+    already_marked = set(df['Enrollment'].astype(str).values)
+    new_rows = []
+    newly_marked = []
+    for student in students:
+        if str(student['enrollment_id']) in already_marked:
+            continue
+        already_marked.add(str(student['enrollment_id']))
+        new_rows.append({
+            'Enrollment': student['enrollment_id'],
+            'Name': student['name'],
+            'Class': student.get('class', 'N/A'),
+            'Subject': subject,
+            'Time Stamp': timestamp
+        })
+        newly_marked.append(student)
+    if new_rows:
+        df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+        df.to_excel(file_path, index=False)
+        print(f"Attendance marked for {len(new_rows)} students at {timestamp} for subject: {subject}")
+        if notify:
+            show_popup(f"Attendance Marked for {len(new_rows)} Students")
+    else:
+        print("No new attendance to mark.")
+    return newly_marked
+
+def prepare_frame(frame, scale=0.25):
+    """
+    Resize a BGR frame for faster processing and convert it to contiguous RGB,
+    which is what face_recognition expects.
+
+    The recognition loops use FrameBufferPool.prepare, which writes the same
+    pixels into reused buffers; this allocating version is kept as the
+    reference it is checked against and for one-off frames.
+    """
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    rgb_small_frame = small_frame[:, :, ::-1]
+    return np.ascontiguousarray(rgb_small_frame)
+
+def _timed(timings, stage, started):
+    now = time.perf_counter()
+    if timings is not None:
+        timings.setdefault(stage, []).append(now - started)
+    return now
+
+def process_frame(frame, frame_buffers, matcher, encode_faces=face_recognition.face_encodings,
+                  tolerance=None, timings=None):
+    """
+    Run one camera frame through preparation, face detection, encoding and
+    matching. Shared by the live recognizer, the recognition engine and
+    session replay so all three measure and run the same pipeline.
+
+    Args:
+        frame (np.ndarray): BGR camera frame.
+        frame_buffers (FrameBufferPool): Buffers used to downscale the frame.
+        matcher (Gallery or MatcherClient): Anything with a match(face_encodings) method.
+        encode_faces (callable): face_recognition.face_encodings or EncoderPool.face_encodings.
+        tolerance (float): Match tolerance (None uses the matcher's default).
+        timings (dict): If given, the seconds spent in each of the 'prepare',
+                        'detect', 'encode' and 'match' stages are appended to
+                        timings[stage].
+
+    Returns:
+        tuple: (face locations in the downscaled frame, one (student or None, distance)
+                match per location).
+    """
+    started = time.perf_counter()
+    rgb_small_frame = frame_buffers.prepare(frame)
+    started = _timed(timings, 'prepare', started)
+    face_locations = face_recognition.face_locations(rgb_small_frame)
+    started = _timed(timings, 'detect', started)
+    face_encodings = encode_faces(rgb_small_frame, face_locations)
+    started = _timed(timings, 'encode', started)
+    if not face_encodings:
+        matches = []
+    elif tolerance is None:
+        matches = matcher.match(face_encodings)
+    else:
+        matches = matcher.match(face_encodings, tolerance)
+    _timed(timings, 'match', started)
+    return face_locations, matches
+
+def draw_matches(frame, face_locations, matches, scale=4):
+    """
+    Draw a box and name for every face: green for recognized students, red
+    with "Unknown" otherwise. Locations are scaled back up to the full frame.
+    """
+    for (top, right, bottom, left), (student, _) in zip(face_locations, matches):
+        if student is not None:
+            name = student['name']
+            rect_color = (0, 255, 0)  # Green for recognized
+        else:
+            name = "Unknown"
+            rect_color = (0, 0, 255)  # Red for unknown
+
+        # Scale back up face location coordinates.
+        top *= scale
+        right *= scale
+        bottom *= scale
+        left *= scale
+        cv2.rectangle(frame, (left, top), (right, bottom), rect_color, 2)
+        cv2.putText(frame, name, (left, top - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, rect_color, 2)
 
-def recognize_students(video_source=0, subject="Data Visualization"):
+def recognize_students(video_source=0, subject="Data Visualization", matcher_address=None,
+                       precision='float64', encoder_workers=0):
     """
     Recognize students from the video feed and mark their attendance.
     If a face is not recognized, a red rectangle is drawn and "Unknown" is displayed.
@@ -81,77 +218,52 @@ def recognize_students(video_source=0, subject="Data Visualization"):
     Args:
         video_source (int or str): Video source (default is 0 for webcam).
         subject (str): The subject name to use when marking attendance.
+        matcher_address (str): Address of a running matcher_service ("host:port" or
+                               "unix:/path"). When given, encodings are sent to the
+                               service instead of loading the gallery locally.
+        precision (str): Storage precision of the local gallery ('float64', 'float16' or 'int8').
+        encoder_workers (int): Number of encoder worker processes used to encode
+                               crowded frames in parallel (0 encodes in this process).
     """
-    student_data = load_student_data()
-    known_encodings = []
-    student_info = []
-    
-    # Prepare known encodings and student info (including class)
-    for data in student_data:
-        known_encodings.extend(data['encodings'])
-        student_info.extend([
-            {
-                'name': data['name'],
-                'enrollment_id': data['enrollment_id'],
-                'class': data.get('class', 'N/A')
-            }
-        ] * len(data['encodings']))
+    if matcher_address:
+        matcher = MatcherClient(matcher_address)
+    else:
+        matcher = Gallery.from_directory(precision=precision)
+    encoder_pool = EncoderPool(encoder_workers) if encoder_workers else None
+    encode_faces = encoder_pool.face_encodings if encoder_pool else face_recognition.face_encodings
     
     video_capture = cv2.VideoCapture(video_source)
+    frame_buffers = FrameBufferPool()
     recognized_students = set()
     print("Starting video stream for subject:", subject, ". Press 'q' to quit.")
     
-    while True:
-        ret, frame = video_capture.read()
-        if not ret:
-            print("Failed to grab frame from webcam. Exiting...")
-            break
-
-        # Resize frame for faster processing and convert from BGR to RGB.
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = small_frame[:, :, ::-1]
-        rgb_small_frame = np.ascontiguousarray(rgb_small_frame)
-
-        # Detect faces and compute encodings.
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            matches = face_recognition.compare_faces(known_encodings, face_encoding)
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
-            
-            if matches[best_match_index]:
-                student = student_info[best_match_index]
-                name = student['name']
-                enrollment_id = student['enrollment_id']
-                student_class = student.get('class', 'N/A')
-                if enrollment_id not in recognized_students:
-                    mark_attendance(name, enrollment_id, student_class, subject)
-                    recognized_students.add(enrollment_id)
-                rect_color = (0, 255, 0)  # Green for recognized
-            else:
-                name = "Unknown"
-                rect_color = (0, 0, 255)  # Red for unknown
-
-            # Scale back up face location coordinates.
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-
-            # Draw rectangle and label on the frame.
-            cv2.rectangle(frame, (left, top), (right, bottom), rect_color, 2)
-            cv2.putText(frame, name, (left, top - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, rect_color, 2)
-
-        cv2.imshow('Attendance Recognition', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    video_capture.release()
-    cv2.destroyAllWindows()
+    try:
+        while True:
+            ret, frame = frame_buffers.read(video_capture)
+            if not ret:
+                print("Failed to grab frame from webcam. Exiting...")
+                break
+
+            face_locations, matches = process_frame(frame, frame_buffers, matcher, encode_faces)
+
+            for student, _ in matches:
+                if student is not None and student['enrollment_id'] not in recognized_students:
+                    mark_attendance(student['name'], student['enrollment_id'],
+                                    student.get('class', 'N/A'), subject)
+                    recognized_students.add(student['enrollment_id'])
+            draw_matches(frame, face_locations, matches)
 
+            cv2.imshow('Attendance Recognition', frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        # Also runs when the matcher connection drops mid-session.
+        video_capture.release()
+        cv2.destroyAllWindows()
+        if matcher_address:
+            matcher.close()
+        if encoder_pool:
+            encoder_pool.close()
 
 if __name__ == '__main__':
     recognize_students()
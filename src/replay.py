@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+import cv2
+import face_recognition
+import numpy as np
+import pandas as pd
+from encoder_pool import EncoderPool
+from gallery import Gallery, DEFAULT_TOLERANCE, PRECISIONS
+from frame_buffers import FrameBufferPool
+from recognize import mark_attendance, process_frame
+
+# Stages timed for every replayed frame, in pipeline order.
+STAGES = ('decode', 'prepare', 'detect', 'encode', 'match', 'mark')
+
+def record_session(output_dir, video_source=0, max_frames=None):
+    """
+    Record a camera session to disk so it can be replayed deterministically.
+    Frames are stored as lossless PNG files alongside a session.json manifest.
+    Press 'q' in the preview window to stop recording.
+
+    Args:
+        output_dir (str): Directory the session is written to.
+        video_source (int or str): Video source (default is 0 for webcam).
+        max_frames (int): Stop after this many frames (None records until 'q').
+
+    Returns:
+        int: Number of frames recorded.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    video_capture = cv2.VideoCapture(video_source)
+    frames = []
+    started = time.perf_counter()
+    print("Recording session to", output_dir, ". Press 'q' to stop.")
+
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = video_capture.read()
+        if not ret:
+            print("Failed to grab frame from webcam. Stopping recording...")
+            break
+        file_name = f"frame_{len(frames):06d}.png"
+        cv2.imwrite(os.path.join(output_dir, file_name), frame)
+        frames.append({'file': file_name, 'time': time.perf_counter() - started})
+
+        cv2.imshow('Recording', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    video_capture.release()
+    cv2.destroyAllWindows()
+
+    manifest = {
+        'video_source': str(video_source),
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'frames': frames
+    }
+    with open(os.path.join(output_dir, 'session.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Recorded {len(frames)} frames.")
+    return len(frames)
+
+def load_session_frames(session_dir):
+    """
+    List the frame files of a recorded session in recording order.
+    """
+    manifest_path = os.path.join(session_dir, 'session.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        names = [frame['file'] for frame in manifest['frames']]
+    else:
+        names = sorted(name for name in os.listdir(session_dir) if name.endswith('.png'))
+    return [os.path.join(session_dir, name) for name in names]
+
+def summarize_timings(samples):
+    """
+    Summarize per-stage latencies in milliseconds.
+    """
+    summary = {}
+    for stage, values in samples.items():
+        ms = np.asarray(values, dtype=np.float64) * 1000.0
+        if len(ms) == 0:
+            summary[stage] = {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'total_ms': 0.0}
+            continue
+        summary[stage] = {
+            'count': int(len(ms)),
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p99_ms': float(np.percentile(ms, 99)),
+            'total_ms': float(ms.sum())
+        }
+    return summary
+
+def read_attendance(attendance_dir):
+    """
+    Collect every attendance row written to a directory, sorted by file and enrollment.
+    """
+    rows = []
+    for file in sorted(os.listdir(attendance_dir)):
+        if file.startswith("attendance_") and file.endswith(".xlsx"):
+            df = pd.read_excel(os.path.join(attendance_dir, file))
+            for _, row in df.sort_values('Enrollment').iterrows():
+                rows.append({'file': file, 'enrollment': str(row['Enrollment']), 'name': row['Name']})
+    return rows
+
+def replay_session(session_dir, subject="Data Visualization", student_dir='../data/students',
+                   precision='float64', tolerance=DEFAULT_TOLERANCE, attendance_dir=None,
+                   encoder_workers=0):
+    """
+    Replay a recorded session through detection, encoding, matching and
+    attendance marking as fast as possible, without a display.
+
+    Args:
+        session_dir (str): Directory written by record_session.
+        subject (str): Subject to mark attendance for.
+        student_dir (str): Directory of enrolled students.
+        precision (str): Gallery storage precision.
+        tolerance (float): Largest distance still accepted as a match.
+        attendance_dir (str): Where attendance is written. A temporary directory
+                              is used (and removed) when None.
+        encoder_workers (int): Encoder worker processes (0 encodes in this process).
+
+    Returns:
+        dict: Frame count, frames per second, per-stage latency summary,
+              face counts and the attendance rows that were written.
+    """
+    frame_paths = load_session_frames(session_dir)
+    gallery = Gallery.from_directory(student_dir, precision=precision)
+    timings = {stage: [] for stage in STAGES}
+    recognized_students = set()
+    faces = 0
+    matched = 0
+    encoder_pool = EncoderPool(encoder_workers) if encoder_workers else None
+    encode_faces = encoder_pool.face_encodings if encoder_pool else face_recognition.face_encodings
+    frame_buffers = FrameBufferPool()
+
+    with tempfile.TemporaryDirectory(prefix='replay_attendance_') as temp_dir:
+        output_dir = attendance_dir or temp_dir
+        started = time.perf_counter()
+        for frame_path in frame_paths:
+            t0 = time.perf_counter()
+            frame = cv2.imread(frame_path)
+            timings['decode'].append(time.perf_counter() - t0)
+            face_locations, matches = process_frame(frame, frame_buffers, gallery, encode_faces,
+                                                    tolerance, timings)
+            t1 = time.perf_counter()
+            for student, _ in matches:
+                if student is None:
+                    continue
+                matched += 1
+                if student['enrollment_id'] not in recognized_students:
+                    mark_attendance(student['name'], student['enrollment_id'], student.get('class', 'N/A'),
+                                    subject, attendance_dir=output_dir, notify=False)
+                    recognized_students.add(student['enrollment_id'])
+            timings['mark'].append(time.perf_counter() - t1)
+            faces += len(face_locations)
+        elapsed = time.perf_counter() - started
+        attendance = read_attendance(output_dir)
+    if encoder_pool:
+        encoder_pool.close()
+
+    return {
+        'session': session_dir,
+        'frames': len(frame_paths),
+        'seconds': elapsed,
+        'fps': len(frame_paths) / elapsed if elapsed > 0 else 0.0,
+        'faces': faces,
+        'matched_faces': matched,
+        'stages': summarize_timings(timings),
+        'attendance': attendance
+    }
+
+def print_replay_report(result):
+    print(f"Replayed {result['frames']} frames in {result['seconds']:.2f} s "
+          f"({result['fps']:.1f} fps), {result['faces']} faces, {result['matched_faces']} matched.")
+    print(f"{'stage':>8} | {'mean ms':>9} | {'p50 ms':>9} | {'p99 ms':>9} | {'total ms':>10}")
+    for stage in STAGES:
+        stats = result['stages'][stage]
+        print(f"{stage:>8} | {stats['mean_ms']:9.2f} | {stats['p50_ms']:9.2f} | "
+              f"{stats['p99_ms']:9.2f} | {stats['total_ms']:10.1f}")
+    print("Attendance marked:")
+    for row in result['attendance']:
+        print(f"  {row['enrollment']} {row['name']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record camera sessions and replay them through the recognizer.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subcommands.add_parser('record', help="Record a camera session to disk.")
+    record_parser.add_argument('session_dir')
+    record_parser.add_argument('--source', default='0', help="Camera index or video file.")
+    record_parser.add_argument('--max-frames', type=int, default=None)
+
+    replay_parser = subcommands.add_parser('replay', help="Replay a session at maximum speed.")
+    replay_parser.add_argument('session_dir')
+    replay_parser.add_argument('--subject', default="Data Visualization")
+    replay_parser.add_argument('--students', default='../data/students')
+    replay_parser.add_argument('--precision', choices=PRECISIONS, default='float64')
+    replay_parser.add_argument('--encoder-workers', type=int, default=0)
+    replay_parser.add_argument('--json', default=None, help="Also write the report to this JSON file.")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        source = int(args.source) if args.source.isdigit() else args.source
+        record_session(args.session_dir, source, args.max_frames)
+    else:
+        result = replay_session(args.session_dir, args.subject, args.students, args.precision,
+                                encoder_workers=args.encoder_workers)
+        print_replay_report(result)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(result, f, indent=2)
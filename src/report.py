@@ -2,7 +2,7 @@ import pandas as pd
 import os
 from datetime import datetime
 
-def generate_monthly_report(subject, month_year, attendance_dir='../data'):
+def generate_monthly_report(subject, month_year, attendance_dir='../data', progress=None):
     """
     Generate a monthly attendance report for a given subject and month.
 
@@ -10,6 +10,8 @@ def generate_monthly_report(subject, month_year, attendance_dir='../data'):
         subject (str): The subject name (e.g., "Data Visualization").
         month_year (str): Month and year in format "YYYY-MM" (e.g., "2025-02").
         attendance_dir (str): Directory where attendance files are stored.
+        progress (callable): Optional progress(fraction, message) callback, called
+                             once per attendance file (e.g. jobs.Job.report).
 
     Returns:
         pd.DataFrame or None: A DataFrame containing aggregated attendance data,
@@ -19,31 +21,36 @@ def generate_monthly_report(subject, month_year, attendance_dir='../data'):
     all_data = []
     session_dates = set()
 
-    # Iterate over files in the attendance directory
-    for file in os.listdir(attendance_dir):
-        # Expected file format: attendance_{subject}_{YYYY-MM-DD}.xlsx
-        if file.startswith(f"attendance_{subject}_") and file.endswith(".xlsx"):
-            try:
-                # Extract the date part from the filename
-                date_str = file.split('_')[-1].replace('.xlsx', '')
-                # Check if the date matches the requested month (YYYY-MM)
-                if date_str.startswith(month_year):
-                    session_dates.add(date_str)
-                    file_path = os.path.join(attendance_dir, file)
-                    df = pd.read_excel(file_path)
-                    
-                    # Normalize key columns to ensure consistency:
-                    if 'Enrollment' in df.columns:
-                        df['Enrollment'] = df['Enrollment'].astype(str).str.strip().str.lower()
-                    if 'Name' in df.columns:
-                        df['Name'] = df['Name'].astype(str).str.strip().str.title()
-                    if 'Class' in df.columns:
-                        df['Class'] = df['Class'].astype(str).str.strip()
-
-                    df['Date'] = date_str  # add Date column for reference
-                    all_data.append(df)
-            except Exception as e:
-                print(f"Error processing file {file}: {e}")
+    # Expected file format: attendance_{subject}_{YYYY-MM-DD}.xlsx
+    matching_files = [
+        file for file in sorted(os.listdir(attendance_dir))
+        if file.startswith(f"attendance_{subject}_") and file.endswith(".xlsx")
+        and file.split('_')[-1].replace('.xlsx', '').startswith(month_year)
+    ]
+
+    # Iterate over the attendance files for the requested month (YYYY-MM)
+    for index, file in enumerate(matching_files):
+        if progress is not None:
+            progress(index / len(matching_files), f"Reading {file}")
+        try:
+            # Extract the date part from the filename
+            date_str = file.split('_')[-1].replace('.xlsx', '')
+            session_dates.add(date_str)
+            file_path = os.path.join(attendance_dir, file)
+            df = pd.read_excel(file_path)
+
+            # Normalize key columns to ensure consistency:
+            if 'Enrollment' in df.columns:
+                df['Enrollment'] = df['Enrollment'].astype(str).str.strip().str.lower()
+            if 'Name' in df.columns:
+                df['Name'] = df['Name'].astype(str).str.strip().str.title()
+            if 'Class' in df.columns:
+                df['Class'] = df['Class'].astype(str).str.strip()
+
+            df['Date'] = date_str  # add Date column for reference
+            all_data.append(df)
+        except Exception as e:
+            print(f"Error processing file {file}: {e}")
 
     if not all_data:
         return None
@@ -86,6 +93,43 @@ def save_report(report_df, subject, month_year, attendance_dir='../data'):
     report_df.to_excel(report_file, index=False)
     return report_file
 
+def export_attendance(subject, attendance_dir='../data', progress=None):
+    """
+    Export every daily attendance file of a subject into a single workbook.
+
+    Args:
+        subject (str): The subject name.
+        attendance_dir (str): Directory where attendance files are stored.
+        progress (callable): Optional progress(fraction, message) callback.
+
+    Returns:
+        str or None: The path to the exported workbook, or None if there is no attendance.
+    """
+    matching_files = sorted(
+        file for file in os.listdir(attendance_dir)
+        if file.startswith(f"attendance_{subject}_") and file.endswith(".xlsx")
+    )
+    all_data = []
+    for index, file in enumerate(matching_files):
+        if progress is not None:
+            progress(index / len(matching_files), f"Reading {file}")
+        try:
+            df = pd.read_excel(os.path.join(attendance_dir, file))
+            df['Date'] = file.split('_')[-1].replace('.xlsx', '')
+            all_data.append(df)
+        except Exception as e:
+            print(f"Error processing file {file}: {e}")
+    if not all_data:
+        return None
+    if progress is not None:
+        progress(1.0, "Writing export")
+    # Not "attendance_..." so the export is never read back as a daily file,
+    # and timestamped so earlier exports are kept.
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H%M%S')
+    export_file = os.path.join(attendance_dir, f"export_{subject}_{timestamp}.xlsx")
+    pd.concat(all_data, ignore_index=True).to_excel(export_file, index=False)
+    return export_file
+
 # For standalone testing
 if __name__ == '__main__':
     subject = input("Enter subject: ").strip()
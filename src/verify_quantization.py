@@ -0,0 +1,143 @@
+import argparse
+import time
+import numpy as np
+from gallery import Gallery, DEFAULT_TOLERANCE, PRECISIONS, synthetic_student_data
+from utils import load_student_data
+
+def split_labelled_probes(student_data):
+    """
+    Hold out the last encoding of every student with at least two samples as a
+    labelled probe; the remaining encodings form the gallery.
+
+    Returns:
+        tuple: (gallery student data, probe encodings, probe enrollment IDs).
+    """
+    gallery_data = []
+    probes = []
+    labels = []
+    for data in student_data:
+        encodings = list(data['encodings'])
+        if len(encodings) >= 2:
+            probes.append(encodings.pop())
+            labels.append(data['enrollment_id'])
+        gallery_data.append(dict(data, encodings=encodings))
+    return gallery_data, np.asarray(probes, dtype=np.float64), labels
+
+def boundary_probes(student_data, tolerance=DEFAULT_TOLERANCE, width=0.01, seed=0):
+    """
+    Make one probe per student placed at roughly the tolerance distance from
+    one of its gallery encodings, so float64 accept/reject decisions sit right
+    at the boundary where quantization error can flip them.
+
+    Args:
+        width (float): Probe distances are drawn uniformly from tolerance +/- width.
+
+    Returns:
+        tuple: (probe encodings, probe enrollment IDs).
+    """
+    rng = np.random.default_rng(seed)
+    probes = []
+    labels = []
+    for data in student_data:
+        if not len(data['encodings']):
+            continue
+        anchor = np.asarray(data['encodings'][rng.integers(len(data['encodings']))], dtype=np.float64)
+        direction = rng.normal(size=anchor.shape)
+        direction /= np.linalg.norm(direction)
+        probes.append(anchor + direction * rng.uniform(tolerance - width, tolerance + width))
+        labels.append(data['enrollment_id'])
+    return np.asarray(probes, dtype=np.float64), labels
+
+def nearest_in_batches(gallery, probes, batch_size=256):
+    """
+    Run Gallery.nearest over the probes in batches to bound the distance matrix size.
+    """
+    indices = []
+    distances = []
+    for start in range(0, len(probes), batch_size):
+        index, distance = gallery.nearest(probes[start:start + batch_size])
+        indices.append(index)
+        distances.append(distance.astype(np.float64))
+    return np.concatenate(indices), np.concatenate(distances)
+
+def compare_precisions(student_data, probes, labels, precisions=PRECISIONS, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare quantized galleries against the float64 reference on labelled probes.
+
+    Args:
+        student_data (list): Gallery student data.
+        probes (np.ndarray): Probe encodings of shape (M, 128).
+        labels (list): Enrollment ID of each probe.
+        precisions (tuple): Precisions to evaluate; float64 is always the reference.
+        tolerance (float): Acceptance threshold.
+
+    Returns:
+        list: One dict per precision with memory, timing and agreement figures.
+    """
+    reference = Gallery(student_data, precision='float64')
+    ref_index, ref_distance = nearest_in_batches(reference, probes)
+    ref_ids = np.asarray([reference.student_info[i]['enrollment_id'] for i in ref_index])
+    ref_accept = ref_distance <= tolerance
+    labels = np.asarray(labels)
+
+    rows = []
+    for precision in precisions:
+        gallery = Gallery(student_data, precision=precision)
+        started = time.perf_counter()
+        index, distance = nearest_in_batches(gallery, probes)
+        elapsed = time.perf_counter() - started
+        ids = np.asarray([gallery.student_info[i]['enrollment_id'] for i in index])
+        accept = distance <= tolerance
+        rows.append({
+            'precision': precision,
+            'memory_kb': gallery.nbytes / 1024.0,
+            'memory_ratio': reference.nbytes / gallery.nbytes,
+            'match_ms': elapsed * 1000.0,
+            'top1_agreement': float(np.mean(ids == ref_ids)),
+            'decision_agreement': float(np.mean(accept == ref_accept)),
+            'top1_accuracy': float(np.mean((ids == labels) & accept)),
+            'max_distance_error': float(np.max(np.abs(distance - ref_distance)))
+        })
+    return rows
+
+def print_report(rows):
+    print(f"{'precision':>9} | {'memory KB':>10} | {'ratio':>5} | {'match ms':>9} | "
+          f"{'top-1 agree':>11} | {'decision agree':>14} | {'accuracy':>8} | {'max dist err':>12}")
+    for row in rows:
+        print(f"{row['precision']:>9} | {row['memory_kb']:10.1f} | {row['memory_ratio']:5.1f} | "
+              f"{row['match_ms']:9.2f} | {row['top1_agreement']:11.2%} | {row['decision_agreement']:14.2%} | "
+              f"{row['top1_accuracy']:8.2%} | {row['max_distance_error']:12.5f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Check that quantized galleries make the same decisions as float64.")
+    parser.add_argument('--students', default='../data/students',
+                        help="Directory of enrolled students used as the labelled set.")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Use this many synthetic students instead of the enrolled ones.")
+    parser.add_argument('--spread', type=float, default=0.1,
+                        help="Per-dimension spread of synthetic student centres.")
+    parser.add_argument('--noise', type=float, default=0.02,
+                        help="Per-dimension noise of synthetic samples around their centre.")
+    parser.add_argument('--boundary', type=float, default=0.0,
+                        help="Also add one probe per student at tolerance +/- this distance "
+                             "from its gallery, to exercise accept/reject flips.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        student_data = synthetic_student_data(args.synthetic, spread=args.spread, noise=args.noise)
+    else:
+        student_data = load_student_data(args.students)
+    gallery_data, probes, labels = split_labelled_probes(student_data)
+    if args.boundary:
+        extra_probes, extra_labels = boundary_probes(gallery_data, args.tolerance, args.boundary)
+        probes = np.concatenate([probes.reshape(-1, extra_probes.shape[1]), extra_probes])
+        labels = list(labels) + extra_labels
+    if len(probes) == 0:
+        print("No student has at least two encodings to hold out as a probe.")
+    else:
+        print(f"{len(probes)} labelled probes against {sum(len(d['encodings']) for d in gallery_data)} "
+              f"gallery encodings.")
+        print_report(compare_precisions(gallery_data, probes, labels, tolerance=args.tolerance))